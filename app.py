@@ -1,7 +1,26 @@
 import streamlit as st
-import pandas as pd
-import io
-import csv
+import contextlib
+import datetime as dt
+import functools
+import importlib.util
+import os
+
+from recon.aggregate import aggregate, month_cubes, vendor_totals
+from recon.bank import (BANK_MATCH_FILE_NAME, DEFAULT_WINDOW_DAYS as BANK_WINDOW_DAYS, match_deposits,
+                        match_summary, payout_batches, read_bank_statements, reconciliation_table)
+from recon.cache import RESULT_CACHE_DIR, ResultCache
+from recon.diagnostics import collect, stage, summarize
+from recon.jobs import JobCancelled, JobRunner
+from recon.ledger import DEFAULT_LEDGER_DIR, ingest, ledger_summary, year_over_year
+from recon.numeric import to_dollars
+from recon.parallel import EXECUTION_MODES, run_platforms
+from recon.period import DEFAULT_PERIOD, Period, month_period, quarter_to_date
+from recon.processors import combine_results, split_results_by_month
+from recon.readers import DEFAULT_CHUNKSIZE, STATEMENT_UPLOAD_TYPES, expand_uploads, source_size
+from recon.report import (DETAIL_ARCHIVE_NAME, PLATFORMS, REPORT_FILE_NAME, build_detail_archive,
+                          build_excel_report, fee_totals, platform_summary, store_rows)
+from recon.variance import (DEFAULT_TOLERANCE, EXCEPTIONS_FILE_NAME, exception_summary, exceptions_csv,
+                            find_exceptions)
 
 # ==========================================
 # 🎨 页面配置与 CSS 样式 (Luckin 风格)
@@ -23,247 +42,11 @@ st.markdown(f"""
     </style>
 """, unsafe_allow_html=True)
 
-# ==========================================
-# 🧠 核心逻辑 & 映射
-# ==========================================
-
-# 官方门店ID映射
-STORE_ID_MAP = {
-    'US00001': 'US00001 - Broadway (755)',
-    'US00002': 'US00002 - 6th Ave (800)',
-    'US00003': 'US00003 - Maiden Lane (100)',
-    'US00004': 'US00004 - 37th St',
-    'US00005': 'US00005 - 8th Ave (901)',
-    'US00006': 'US00006 - Fulton St (102)',
-}
-
-# Uber location name mapping
-UBER_LOCATION_MAP = {
-    'broadway': 'US00001',
-    '6th ave': 'US00002',
-    'sixth ave': 'US00002',
-    'maiden': 'US00003',
-    '37th': 'US00004',
-    '8th ave': 'US00005',
-    'eighth ave': 'US00005',
-    'fulton': 'US00006',
-}
-
-def extract_store_id(raw_text, platform='generic'):
-    """Extract standardized store ID from various platform formats"""
-    if pd.isna(raw_text):
-        return '未知门店'
-    
-    text = str(raw_text).strip()
-    text_lower = text.lower()
-    
-    # Check for direct US000XX pattern
-    import re
-    match = re.search(r'US0000[1-6]', text, re.IGNORECASE)
-    if match:
-        store_id = match.group().upper()
-        return STORE_ID_MAP.get(store_id, store_id)
-    
-    # Platform-specific mapping
-    if platform == 'uber':
-        for key, store_id in UBER_LOCATION_MAP.items():
-            if key in text_lower:
-                return STORE_ID_MAP.get(store_id, store_id)
-    
-    # Address-based mapping for Grubhub
-    address_map = {
-        '755': 'US00001', 'broadway': 'US00001',
-        '800': 'US00002', '6th': 'US00002',
-        '100': 'US00003', 'maiden': 'US00003',
-        '37': 'US00004',
-        '901': 'US00005', '8th': 'US00005',
-        '102': 'US00006', 'fulton': 'US00006',
-    }
-    
-    for key, store_id in address_map.items():
-        if key in text_lower:
-            return STORE_ID_MAP.get(store_id, store_id)
-    
-    return text[:30] if len(text) > 30 else text
-
-def clean_num(x):
-    """Convert various number formats to float"""
-    if isinstance(x, (int, float)):
-        return x
-    try:
-        clean = str(x).replace(',', '').replace('$', '').replace(' ', '').strip()
-        return float(clean) if clean else 0.0
-    except:
-        return 0.0
-
-def find_header_row(uploaded_file, target_columns):
-    """Find the row containing column headers"""
-    uploaded_file.seek(0)
-    try:
-        content = uploaded_file.getvalue().decode('utf-8', errors='replace').splitlines()
-        reader = csv.reader(content)
-        for i, row in enumerate(reader):
-            clean_row = [str(x).strip() for x in row]
-            matches = sum(1 for col in target_columns if col in clean_row)
-            if matches >= 2:
-                uploaded_file.seek(0)
-                return i
-    except Exception:
-        return None
-    return None
-
-# ==========================================
-# 🟦 平台数据处理 - 修正版（费用转正数）
-# ==========================================
-
-def process_ubereats(uploaded_file):
-    """Process UberEats CSV - fees converted to positive values"""
-    target_cols = ['餐厅名称', '销售额（不含税费）', '平台服务费']
-    header_row = find_header_row(uploaded_file, target_cols)
-    if header_row is None:
-        return None
-
-    df = pd.read_csv(uploaded_file, header=header_row)
-    df.columns = df.columns.str.strip()
-    
-    # Date filter - October 2025 only
-    if '订单日期' in df.columns:
-        df['Date'] = pd.to_datetime(df['订单日期'], format='%m/%d/%Y', errors='coerce')
-        df = df[(df['Date'] >= '2025-10-01') & (df['Date'] <= '2025-10-31')]
-    
-    def get_col(col_name):
-        return df[col_name].apply(clean_num) if col_name in df.columns else pd.Series([0.0] * len(df))
-
-    # 收入项（正数）
-    df['Gross_Sales'] = get_col('销售额（不含税费）')
-    df['Tax_Collected'] = get_col('销售额税费')
-    
-    # 费用项（原始负数 → 取绝对值）
-    df['Discount'] = get_col('商品优惠（含税）').abs()  # 折扣支出
-    df['Commission'] = get_col('平台服务费').abs()  # 平台佣金
-    df['Order_Error'] = get_col('订单错误调整额').abs()  # 订单错误
-    
-    # 补贴/返还（正数收入）
-    df['Marketing_Credit'] = get_col('营销调整额')  # Uber给的营销补贴
-    
-    # 净入账 = 使用column 26 (调整后的总销售额含税费) 与 Analytics 保持一致
-    # 但这里我们重新计算以便理解
-    df['Calculated_Net'] = (df['Gross_Sales'] + df['Tax_Collected'] 
-                           - df['Discount'] - df['Commission'] 
-                           - df['Order_Error'] + df['Marketing_Credit'])
-    
-    # 实际净入账（来自CSV）
-    df['Net_Payout'] = get_col('收入总额')
-    
-    df['Vendor'] = 'UberEats'
-    df['Store_Standard'] = df['餐厅名称'].apply(lambda x: extract_store_id(x, 'uber'))
-    
-    return df[['Vendor', 'Store_Standard', 'Gross_Sales', 'Tax_Collected', 
-               'Discount', 'Commission', 'Marketing_Credit', 'Order_Error', 
-               'Calculated_Net', 'Net_Payout']]
-
-def process_doordash(uploaded_file):
-    """Process DoorDash CSV - fees converted to positive values"""
-    target_cols = ['店铺名称', '小计', '佣金']
-    header_row = find_header_row(uploaded_file, target_cols)
-    if header_row is None:
-        return None
-
-    df = pd.read_csv(uploaded_file, header=header_row)
-    df.columns = df.columns.str.strip()
-    
-    # Date filter - October 2025 only
-    if '时间戳本地日期' in df.columns:
-        df['Date'] = pd.to_datetime(df['时间戳本地日期'], format='%m/%d/%Y', errors='coerce')
-        df = df[(df['Date'] >= '2025-10-01') & (df['Date'] <= '2025-10-31')]
-    
-    def get_col(col_name):
-        matches = [c for c in df.columns if col_name in c]
-        if matches:
-            return df[matches[0]].apply(clean_num)
-        return pd.Series([0.0] * len(df))
-
-    # 收入项
-    df['Gross_Sales'] = get_col('小计')
-    df['Tax_Collected'] = get_col('税款小计')
-    
-    # 费用项（取绝对值）
-    df['Discount'] = get_col('由您出资').abs()  # 商家承担的折扣
-    df['Commission'] = get_col('佣金').abs()  # 佣金
-    df['Marketing_Fee'] = get_col('营销费').abs()  # 营销费
-    df['Order_Error'] = get_col('错误费用').abs()
-    
-    # 补贴/返还
-    df['Marketing_Credit'] = get_col('营销积分')  # DoorDash给的积分
-    df['DD_Funded'] = get_col('由 DoorDash 出资').abs()  # DD承担的折扣（对商家是好事）
-    
-    # 合并费用类
-    df['Total_Discount'] = df['Discount']
-    df['Total_Commission'] = df['Commission']
-    df['Total_Marketing'] = df['Marketing_Fee']
-    df['Total_Credit'] = df['Marketing_Credit'] + df['DD_Funded']
-    
-    # 净入账
-    df['Net_Payout'] = get_col('净总计')
-    
-    df['Vendor'] = 'DoorDash'
-    df['Store_Standard'] = df['店铺名称'].apply(lambda x: extract_store_id(x, 'doordash'))
-    
-    return df[['Vendor', 'Store_Standard', 'Gross_Sales', 'Tax_Collected',
-               'Total_Discount', 'Total_Commission', 'Total_Marketing', 
-               'Total_Credit', 'Order_Error', 'Net_Payout']]
-
-def process_grubhub(uploaded_file):
-    """Process Grubhub CSV - fees converted to positive values"""
-    target_cols = ['store_name', 'subtotal', 'commission']
-    header_row = find_header_row(uploaded_file, target_cols)
-    if header_row is None:
-        return None
-
-    df = pd.read_csv(uploaded_file, header=header_row)
-    df.columns = df.columns.str.strip()
-    
-    # Date filter - October 2025 only (exclude records with invalid dates)
-    if 'transaction_date' in df.columns:
-        df['Date'] = pd.to_datetime(df['transaction_date'], format='%m/%d/%Y', errors='coerce')
-        df = df[(df['Date'] >= '2025-10-01') & (df['Date'] <= '2025-10-31')]
-    
-    def get_col(col_name):
-        return df[col_name].apply(clean_num) if col_name in df.columns else pd.Series([0.0] * len(df))
-
-    # 收入项
-    df['Gross_Sales'] = get_col('subtotal')
-    df['Tax_Collected'] = get_col('subtotal_sales_tax')
-    
-    # 费用项（取绝对值）
-    df['Commission'] = get_col('commission').abs()
-    df['Delivery_Commission'] = get_col('delivery_commission').abs()
-    df['Processing_Fee'] = get_col('processing_fee').abs()
-    df['Merchant_Promo'] = get_col('merchant_funded_promotion').abs()
-    df['Merchant_Loyalty'] = get_col('merchant_funded_loyalty').abs()
-    
-    # 合并
-    df['Total_Discount'] = df['Merchant_Promo'] + df['Merchant_Loyalty']
-    df['Total_Commission'] = df['Commission'] + df['Delivery_Commission']
-    df['Total_Processing'] = df['Processing_Fee']
-    
-    # 净入账
-    df['Net_Payout'] = get_col('merchant_net_total')
-    
-    df['Vendor'] = 'Grubhub'
-    # Use street_address for store identification
-    store_info = df['store_name'].astype(str) + " " + df.get('street_address', pd.Series(['']*len(df))).astype(str)
-    df['Store_Standard'] = store_info.apply(lambda x: extract_store_id(x, 'grubhub'))
-    
-    return df[['Vendor', 'Store_Standard', 'Gross_Sales', 'Tax_Collected',
-               'Total_Discount', 'Total_Commission', 'Total_Processing', 'Net_Payout']]
-
 # ==========================================
 # 🖥️ STREAMLIT UI
 # ==========================================
 
 # Logo loading - use relative path for Streamlit Cloud deployment
-import os
 logo_path = os.path.join(os.path.dirname(__file__), "logo.png")
 if os.path.exists(logo_path):
     col_logo, col_title = st.columns([1, 4])
@@ -286,7 +69,7 @@ with st.sidebar:
     - ✅ 费用显示为正数（支出）
     - ✅ 清晰区分各类费用
     - ✅ 与 Analytics App 数据对齐
-    - ✅ 仅统计10月数据
+    - ✅ 按所选账期统计（默认 2025年10月）
     """)
     
     st.markdown("### 💡 数据说明")
@@ -300,48 +83,224 @@ with st.sidebar:
     - 方便会计理解和入账
     """)
 
+    st.markdown("### 🗓️ 账期")
+    period_kind = st.radio("账期类型", ['单月', '季度至今', '自定义区间'], horizontal=True)
+    if period_kind == '单月':
+        col_y, col_m = st.columns(2)
+        with col_y:
+            year = st.selectbox("年", list(range(2023, dt.date.today().year + 2)),
+                                index=list(range(2023, dt.date.today().year + 2)).index(DEFAULT_PERIOD.start.year))
+        with col_m:
+            month = st.selectbox("月", list(range(1, 13)), index=DEFAULT_PERIOD.start.month - 1)
+        period = month_period(year, month)
+    elif period_kind == '季度至今':
+        period = quarter_to_date(st.date_input("截至日期", value=dt.date.today()))
+    else:
+        date_range = st.date_input("起止日期", value=(DEFAULT_PERIOD.start, DEFAULT_PERIOD.end))
+        period = Period(*date_range) if len(date_range) == 2 else Period(date_range[0], date_range[0])
+    st.caption(f"当前账期: {period.start} ~ {period.end}")
+    split_months = st.checkbox("按月拆分导出", value=False, help="跨月账期一次解析，按月份分别生成报表")
+
+    st.markdown("### ⚙️ 处理选项")
+    chunked_mode = st.checkbox("大文件模式（分块读取）", value=False,
+                               help="逐块读取 CSV 并累计门店汇总，内存占用不随文件大小增长；明细表改为按门店汇总。"
+                                    "分块汇总没有订单指纹，重叠订单无法去重，因此每个平台只能上传一个文件")
+    chunksize = None
+    if chunked_mode:
+        chunksize = int(st.number_input("每块行数", min_value=10_000, value=DEFAULT_CHUNKSIZE, step=50_000))
+    execution_mode = st.selectbox("执行方式", EXECUTION_MODES, index=0,
+                                  format_func=lambda m: {'thread': '并行（线程池）', 'process': '并行（进程池）', 'sequential': '顺序执行'}[m],
+                                  help="三个平台互不依赖，并行时总耗时约等于最慢的平台")
+    use_disk_cache = st.checkbox("磁盘缓存", value=False,
+                                 help=f"相同文件的处理结果同时保存到 {RESULT_CACHE_DIR}，重启后仍可复用")
+    write_ledger = st.checkbox("写入台账", value=False, disabled=chunked_mode,
+                               help=f"处理后的订单明细追加到 Parquet 台账 {DEFAULT_LEDGER_DIR}（按订单指纹去重，重复导入只写入新增/变动的订单），用于跨月/同比汇总")
+    compact_mode = st.checkbox("紧凑内存（金额按整数分）", value=False,
+                               help="金额以 int64 分存储、平台/门店以分类类型存储：合计精确到分、内存占用降为几分之一；展示和导出时换算回美元")
+    tolerance = st.number_input("对账差异容差（美元）", min_value=0.0, value=DEFAULT_TOLERANCE, step=0.01, format="%.2f",
+                                help="每笔订单的平台净入账与按明细推算的预期净入账相差超过此值时列为差异")
+    show_diagnostics = st.checkbox("🔍 诊断面板", value=False,
+                                   help="显示各平台每个处理阶段（读取、过滤、清洗、门店识别、指纹、聚合）的耗时、行数和内存")
+
+@st.cache_resource
+def get_result_cache(disk_dir=None):
+    """One result cache per server process, shared across reruns and sessions"""
+    return ResultCache(disk_dir=disk_dir)
+
+try:
+    result_cache = get_result_cache(RESULT_CACHE_DIR if use_disk_cache else None)
+except PermissionError as e:
+    # 缓存目录归属/权限不安全：不读其中的文件，退回内存缓存
+    st.sidebar.error(f"磁盘缓存目录不安全，已改用内存缓存：{e}")
+    result_cache = get_result_cache(None)
+
 # 上传区域
-st.subheader("📂 请上传平台账单 (CSV)")
-col1, col2, col3 = st.columns(3)
+st.subheader("📂 请上传平台账单 (CSV / Excel)")
+st.caption("每个平台可上传多个文件（如各门店的周报）：CSV、gzip 压缩的 CSV、xlsx，或包含这些文件的 zip 压缩包；GBK / UTF-16 编码自动识别；重叠的订单只计一次（大文件模式下每个平台只能一个文件）")
+# 每个注册平台一个上传框
+uploads = {}
+for column, platform in zip(st.columns(len(PLATFORMS)), PLATFORMS):
+    with column:
+        uploads[platform] = st.file_uploader(f"{platform} 账单", type=STATEMENT_UPLOAD_TYPES, accept_multiple_files=True)
 
-with col1:
-    uber_file = st.file_uploader("UberEats 账单", type=['csv'])
-with col2:
-    dd_file = st.file_uploader("DoorDash 账单", type=['csv'])
-with col3:
-    gh_file = st.file_uploader("Grubhub 账单", type=['csv'])
+with st.expander("🏦 银行流水（可选）：核对平台打款是否到账"):
+    bank_files = st.file_uploader("银行对账单 (CSV / OFX / QFX)", type=['csv', 'ofx', 'qfx'], accept_multiple_files=True,
+                                  help="按平台 × 门店 × 结算周汇总净入账，与银行入账按金额（容差内）和日期窗口配对；支持一笔打款分多次到账、多个门店合并一笔到账")
+    bank_window = st.number_input("到账日期窗口（天）", min_value=0, value=BANK_WINDOW_DAYS, step=1)
 
 st.markdown("<br>", unsafe_allow_html=True)
 
+def process_uploads(job, sources, names, sizes, execution_mode, cache, options, ledger_dir, tolerance, period):
+    """Background part of a run: parse every file, merge per platform, ingest, aggregate, find exceptions
+
+    Runs on the job runner's thread, so it reports through job instead of st.*.
+    """
+    results = dict.fromkeys(PLATFORMS)
+    frames = {platform: {} for platform in results}
+    ingested, cube, exceptions = None, None, None
+    # 各阶段耗时/内存记录（诊断面板）；没勾选时也只是几次计时调用
+    with collect('app') as stage_records:
+        job.set_step("解析账单")
+        with contextlib.closing(run_platforms(sources, mode=execution_mode, cache=cache,
+                                              listener=job.on_record, **options)) as outcomes:
+            for key, df, error in outcomes:
+                platform, i = key
+                if isinstance(error, JobCancelled):
+                    raise error
+                # 单个文件失败只报错，不影响同批其他文件
+                message = None
+                if error is not None:
+                    message = f"❌ {platform} {names[key]} 处理失败: {error}"
+                elif df is None:
+                    message = f"❌ {platform} {names[key]} 文件格式错误"
+                else:
+                    frames[platform][i] = df
+                job.file_done(sizes[key], message)
+                job.check()
+        job.set_step("合并")
+        with stage('combine'):
+            for platform, done_files in frames.items():
+                # 按上传顺序一次合并；周报/月报重叠的订单只保留一次（后上传的优先）
+                results[platform] = combine_results([done_files[i] for i in sorted(done_files)],
+                                                    compact=options['compact'])
+        if any(v is not None for v in results.values()):
+            if ledger_dir:
+                job.set_step("写入台账")
+                with stage('ledger'):
+                    ingested = ingest(results, ledger_dir)
+            # 全部指标一次聚合（平台 × 门店 × 日），下面的卡片、汇总表和导出都读这份结果
+            job.set_step("汇总")
+            with stage('aggregate'):
+                cube = aggregate(results)
+            with stage('exceptions'):
+                exceptions = find_exceptions(results, tolerance)
+    return {'results': results, 'cube': cube, 'exceptions': exceptions, 'ingested': ingested,
+            'records': stage_records, 'period': period, 'tolerance': tolerance}
+
+@st.cache_resource
+def get_job_runner():
+    """One job queue per server process - runs survive reruns, and sessions queue behind each other"""
+    return JobRunner()
+
+job_runner = get_job_runner()
+
+def job_owner():
+    """Signed-in user (st.login) the session's jobs belong to, or None for an anonymous session"""
+    return st.user.get('email') or st.user.get('sub') if st.user.get('is_logged_in') else None
+
+@st.fragment(run_every=1.0)
+def job_progress(job):
+    """Live status of a queued / running job; reruns the page once it has finished"""
+    if job.finished:
+        st.rerun()
+    if job.status == 'queued':
+        text = f"排队中，前面还有 {job_runner.queue_position(job)} 个任务..."
+    else:
+        text = (f"{job.step}：{job.files_done}/{job.files_total} 个文件，已读取 {job.rows:,} 行"
+                f"（{job.rows_per_sec:,.0f} 行/秒，{job.elapsed:.0f} 秒）")
+    st.progress(job.fraction, text=text)
+    if job.cancel_requested:
+        st.caption("正在取消...")
+    elif st.button("⏹️ 取消处理"):
+        job.cancel()
+
 if st.button("🚀 开始自动化对账处理", type="primary"):
-    results = {'UberEats': None, 'DoorDash': None, 'Grubhub': None}
-    
-    my_bar = st.progress(0)
-    
-    if uber_file:
-        results['UberEats'] = process_ubereats(uber_file)
-        if results['UberEats'] is None:
-            st.error("❌ UberEats 文件格式错误")
-    my_bar.progress(30)
-    
-    if dd_file:
-        results['DoorDash'] = process_doordash(dd_file)
-        if results['DoorDash'] is None:
-            st.error("❌ DoorDash 文件格式错误")
-    my_bar.progress(60)
-    
-    if gh_file:
-        results['Grubhub'] = process_grubhub(gh_file)
-        if results['Grubhub'] is None:
-            st.error("❌ Grubhub 文件格式错误")
-    my_bar.progress(90)
+    # 每个文件（zip 内的每个账单）是一个任务，所有平台的文件一起并行处理
+    sources, names, sizes = {}, {}, {}
+    for platform, files in uploads.items():
+        entries, errors = expand_uploads(files)
+        for name, error in errors:
+            st.error(f"❌ {platform} {name} 无法读取: {error}")
+        for i, (name, source) in enumerate(entries):
+            # 后台任务拿一份字节快照，页面重跑或换掉上传文件都不影响正在处理的数据
+            data = source.getvalue() if hasattr(source, 'getvalue') else source
+            sources[(platform, i)], names[(platform, i)], sizes[(platform, i)] = data, name, source_size(data)
+    counts = {}
+    for platform, _ in sources:
+        counts[platform] = counts.get(platform, 0) + 1
+    several = [platform for platform, n in counts.items() if n > 1]
+    if not sources:
+        st.warning("⚠️ 请至少上传一个有效的账单文件。")
+    elif chunksize and several:
+        st.error(f"❌ 大文件模式下每个平台只能处理一个文件（{', '.join(several)} 有多个）：分块汇总无法去除重叠订单。"
+                 "请关闭大文件模式，或每个平台只上传一个账单。")
+    else:
+        job = job_runner.submit(
+            process_uploads, sources, names, sizes, execution_mode, result_cache,
+            dict(chunksize=chunksize, period=period, compact=compact_mode),
+            # 大文件模式只有门店汇总，写不进台账（复选框禁用后仍保留之前的勾选）
+            DEFAULT_LEDGER_DIR if write_ledger and not chunked_mode else None, tolerance, period,
+            label=', '.join(f"{platform} × {n}" for platform, n in counts.items()),
+            files_total=len(sources), bytes_total=sum(sizes.values()), params={'period': period.label},
+            owner=job_owner())
+        # 任务 ID 记在会话里，页面重跑后仍能看到进度和结果；登录用户另记在网址里，刷新页面后可取回
+        # （只有提交者本人取得到）。匿名会话不放进网址，免得链接、浏览记录泄露结果
+        st.session_state['recon_job'] = job.id
+        st.session_state.pop('recon_result', None)
+        if job.owner is not None:
+            st.query_params['job'] = job.id
+
+owner = job_owner()
+job = job_runner.get(st.session_state.get('recon_job') or (owner and st.query_params.get('job')), owner=owner)
+# 结果交给本会话保管（服务器上的任务只留状态），之后的重跑直接用会话里的这份
+if job is not None and job.status == 'done' and st.session_state.get('recon_result', (None,))[0] != job.id:
+    st.session_state['recon_result'] = (job.id, job_runner.take_result(job))
+job_result = st.session_state['recon_result'][1] if job is not None and job.status == 'done' else None
+if job is not None and not job.finished:
+    job_progress(job)
+elif job is not None and job.status == 'cancelled':
+    st.warning(f"⏹️ 处理已取消（{job.label}）")
+elif job is not None and job.status == 'failed':
+    st.error(f"❌ 处理失败: {job.error}")
+elif job is not None and job_result is None:
+    st.warning("⚠️ 这次处理的结果已不在服务器上，请重新上传处理。")
+
+if job_result is not None:
+    for message in job.messages:
+        st.error(message)
+    results, cube, exceptions = job_result['results'], job_result['cube'], job_result['exceptions']
+    run_period, run_tolerance = job_result['period'], job_result['tolerance']
+    # 大文件模式的结果是按月的门店汇总：没有订单和日期，逐单/按结算周的核对做不了
+    chunked_run = any(df is not None and 'Date' not in df.columns for df in results.values())
     
     if all(v is None for v in results.values()):
-        st.warning("⚠️ 请至少上传一个有效的 CSV 文件。")
-        my_bar.empty()
+        st.warning("⚠️ 请至少上传一个有效的账单文件。")
     else:
-        my_bar.progress(100)
-        st.success("✅ 数据处理完成！")
+        st.success(f"✅ 数据处理完成！（{job.rows:,} 行，{job.elapsed:.1f} 秒）")
+        for platform, c in (job_result['ingested'] or {}).items():
+            st.info(f"🗄️ {platform} 台账: 新增 {c['new']:,} 行，更新 {c['changed']:,} 行，"
+                    f"已存在 {c['unchanged']:,} 行 → {DEFAULT_LEDGER_DIR}")
+        stage_records = job_result['records']
+        by_vendor = to_dollars(vendor_totals(cube, PLATFORMS))
+        
+        if show_diagnostics:
+            with st.expander("🔍 诊断面板：各阶段耗时与内存", expanded=True):
+                diagnostics = summarize(stage_records)
+                st.caption(f"合计 {diagnostics['seconds'].sum():.2f} 秒（并行执行时各平台耗时重叠）；"
+                           "设置环境变量 RECON_TRACEMALLOC=1 可额外记录 Python 内存分配")
+                st.dataframe(diagnostics.style.format({'seconds': '{:.3f}', 'rss_peak_mb': '{:.0f}',
+                                                       'alloc_delta_mb': '{:.1f}'}, na_rep=''),
+                             hide_index=True)
         
         # ==========================================
         # 📊 分平台详细报告
@@ -353,37 +312,7 @@ if st.button("🚀 开始自动化对账处理", type="primary"):
                 st.subheader(f"📊 {platform} 费用明细")
                 
                 # 汇总统计
-                summary_data = {
-                    '订单数': len(df),
-                    '销售额 (Gross)': df['Gross_Sales'].sum(),
-                    '税费收入': df['Tax_Collected'].sum(),
-                }
-                
-                if platform == 'UberEats':
-                    summary_data.update({
-                        '💸 折扣支出': df['Discount'].sum(),
-                        '💸 平台佣金': df['Commission'].sum(),
-                        '💰 营销补贴 (收入)': df['Marketing_Credit'].sum(),
-                        '💸 订单错误': df['Order_Error'].sum(),
-                        '净入账': df['Net_Payout'].sum(),
-                    })
-                    
-                elif platform == 'DoorDash':
-                    summary_data.update({
-                        '💸 折扣支出 (商家)': df['Total_Discount'].sum(),
-                        '💸 平台佣金': df['Total_Commission'].sum(),
-                        '💸 营销费': df['Total_Marketing'].sum(),
-                        '💰 平台补贴 (收入)': df['Total_Credit'].sum(),
-                        '净入账': df['Net_Payout'].sum(),
-                    })
-                    
-                elif platform == 'Grubhub':
-                    summary_data.update({
-                        '💸 折扣支出': df['Total_Discount'].sum(),
-                        '💸 佣金合计': df['Total_Commission'].sum(),
-                        '💸 处理费': df['Total_Processing'].sum(),
-                        '净入账': df['Net_Payout'].sum(),
-                    })
+                summary_data = platform_summary(platform, by_vendor.loc[platform])
                 
                 # 显示汇总卡片
                 cols = st.columns(4)
@@ -405,38 +334,18 @@ if st.button("🚀 开始自动化对账处理", type="primary"):
         st.markdown("---")
         st.subheader("📊 三平台费用汇总")
         
-        total_orders = sum(len(df) for df in results.values() if df is not None)
-        total_gross = sum(df['Gross_Sales'].sum() for df in results.values() if df is not None)
-        total_net = sum(df['Net_Payout'].sum() for df in results.values() if df is not None)
-        
-        # 计算各类费用总和
-        total_discount = 0
-        total_commission = 0
-        total_marketing = 0
-        total_processing = 0
-        total_credit = 0
-        
-        if results['UberEats'] is not None:
-            df = results['UberEats']
-            total_discount += df['Discount'].sum()
-            total_commission += df['Commission'].sum()
-            total_credit += df['Marketing_Credit'].sum()
-        
-        if results['DoorDash'] is not None:
-            df = results['DoorDash']
-            total_discount += df['Total_Discount'].sum()
-            total_commission += df['Total_Commission'].sum()
-            total_marketing += df['Total_Marketing'].sum()
-            total_credit += df['Total_Credit'].sum()
-        
-        if results['Grubhub'] is not None:
-            df = results['Grubhub']
-            total_discount += df['Total_Discount'].sum()
-            total_commission += df['Total_Commission'].sum()
-            total_processing += df['Total_Processing'].sum()
+        totals = fee_totals(cube)
+        total_orders = totals['orders']
+        total_gross = totals['gross']
+        total_net = totals['net']
+        total_discount = totals['discount']
+        total_commission = totals['commission']
+        total_marketing = totals['marketing']
+        total_processing = totals['processing']
+        total_credit = totals['credit']
         
         st.markdown(f"""
-        ### 📈 费用汇总表 (10月)
+        ### 📈 费用汇总表 ({run_period.label})
         
         | 项目 | 金额 | 说明 |
         |------|------|------|
@@ -465,90 +374,108 @@ if st.button("🚀 开始自动化对账处理", type="primary"):
                 net_rate = (total_net / total_gross) * 100
                 st.metric("净收入率", f"{net_rate:.1f}%")
         
+        # ==========================================
+        # 🏪 门店费用
+        # ==========================================
+        st.markdown("### 🏪 门店费用")
+        stores = store_rows(cube)
+        money_cols = [c for c in stores.columns if c not in ('平台', '门店', '订单数', '费用率')]
+        st.dataframe(stores.style.format({'费用率': '{:.1%}', **{c: '${:,.2f}' for c in money_cols}}, na_rep='-'),
+                     hide_index=True)
+        
+        # ==========================================
+        # ⚠️ 对账差异（净入账 ≠ 预期净入账）
+        # ==========================================
+        st.markdown("### ⚠️ 对账差异")
+        if chunked_run:
+            st.info("ℹ️ 大文件模式只保留门店汇总，没有逐单明细，未做订单级差异检查；请关闭大文件模式后重新处理。")
+        elif len(exceptions) == 0:
+            st.success(f"✅ 所有订单的净入账与预期一致（容差 ${run_tolerance:,.2f}）")
+        else:
+            st.warning(f"共 {len(exceptions):,} 笔订单净入账与预期相差超过 ${run_tolerance:,.2f}，按门店与原因汇总如下")
+            st.dataframe(exception_summary(exceptions).style.format(
+                {'差异合计': '${:,.2f}', '最大单笔差异': '${:,.2f}'}), hide_index=True)
+            st.download_button(
+                label="📥 下载差异订单明细 (CSV)",
+                data=functools.partial(exceptions_csv, exceptions),
+                file_name=EXCEPTIONS_FILE_NAME,
+                mime="text/csv",
+                on_click="ignore"
+            )
+        
+        # ==========================================
+        # 🏦 银行到账核对
+        # ==========================================
+        if bank_files and chunked_run:
+            st.markdown("### 🏦 银行到账核对")
+            st.info("ℹ️ 大文件模式只保留按月的门店汇总，无法按结算周汇总打款批次，已跳过银行到账核对；请关闭大文件模式后重新处理。")
+        elif bank_files:
+            st.markdown("### 🏦 银行到账核对")
+            try:
+                deposits = read_bank_statements(bank_files)
+                matched = match_deposits(payout_batches(results, cube), deposits, window_days=bank_window)
+            except ValueError as e:
+                st.error(f"❌ 银行流水无法读取: {e}")
+            else:
+                unmatched = len(matched['unmatched_payouts'])
+                st.caption(f"银行入账 {len(deposits):,} 笔，已配对 {len(matched['matches']):,} 组；"
+                           f"未到账的打款批次 {unmatched:,} 个，未识别的入账 {len(matched['unmatched_deposits']):,} 笔")
+                st.dataframe(match_summary(matched).style.format(
+                    {'Payout': '${:,.2f}', 'Deposit_Amount': '${:,.2f}'}), hide_index=True)
+                st.download_button(
+                    label="📥 下载银行到账核对表 (CSV)",
+                    data=reconciliation_table(matched).to_csv(index=False).encode('utf-8-sig'),
+                    file_name=BANK_MATCH_FILE_NAME,
+                    mime="text/csv",
+                    on_click="ignore"
+                )
+        
         # ==========================================
         # 📥 Excel 导出
         # ==========================================
         st.markdown("---")
         st.subheader("📥 导出报表")
         
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            wb = writer.book
-            
-            # 格式定义
-            fmt_header = wb.add_format({
-                'bold': True, 'bg_color': '#0022AB', 'font_color': 'white',
-                'border': 1, 'align': 'center', 'valign': 'vcenter'
-            })
-            fmt_currency = wb.add_format({'num_format': '$#,##0.00'})
-            fmt_expense = wb.add_format({'num_format': '$#,##0.00', 'font_color': '#C00000'})
-            fmt_income = wb.add_format({'num_format': '$#,##0.00', 'font_color': '#008000'})
-            
-            # Sheet 1: 费用汇总
-            summary_rows = [
-                ['项目', 'UberEats', 'DoorDash', 'Grubhub', '合计'],
-                ['订单数', 
-                 len(results['UberEats']) if results['UberEats'] is not None else 0,
-                 len(results['DoorDash']) if results['DoorDash'] is not None else 0,
-                 len(results['Grubhub']) if results['Grubhub'] is not None else 0,
-                 total_orders],
-                ['销售总额',
-                 results['UberEats']['Gross_Sales'].sum() if results['UberEats'] is not None else 0,
-                 results['DoorDash']['Gross_Sales'].sum() if results['DoorDash'] is not None else 0,
-                 results['Grubhub']['Gross_Sales'].sum() if results['Grubhub'] is not None else 0,
-                 total_gross],
-            ]
-            
-            # Add fee breakdowns
-            uber_discount = results['UberEats']['Discount'].sum() if results['UberEats'] is not None else 0
-            dd_discount = results['DoorDash']['Total_Discount'].sum() if results['DoorDash'] is not None else 0
-            gh_discount = results['Grubhub']['Total_Discount'].sum() if results['Grubhub'] is not None else 0
-            
-            uber_comm = results['UberEats']['Commission'].sum() if results['UberEats'] is not None else 0
-            dd_comm = results['DoorDash']['Total_Commission'].sum() if results['DoorDash'] is not None else 0
-            gh_comm = results['Grubhub']['Total_Commission'].sum() if results['Grubhub'] is not None else 0
-            
-            dd_mkt = results['DoorDash']['Total_Marketing'].sum() if results['DoorDash'] is not None else 0
-            gh_proc = results['Grubhub']['Total_Processing'].sum() if results['Grubhub'] is not None else 0
-            
-            uber_credit = results['UberEats']['Marketing_Credit'].sum() if results['UberEats'] is not None else 0
-            dd_credit = results['DoorDash']['Total_Credit'].sum() if results['DoorDash'] is not None else 0
-            
-            uber_net = results['UberEats']['Net_Payout'].sum() if results['UberEats'] is not None else 0
-            dd_net = results['DoorDash']['Net_Payout'].sum() if results['DoorDash'] is not None else 0
-            gh_net = results['Grubhub']['Net_Payout'].sum() if results['Grubhub'] is not None else 0
-            
-            summary_rows.extend([
-                ['折扣/促销 (支出)', uber_discount, dd_discount, gh_discount, total_discount],
-                ['平台佣金 (支出)', uber_comm, dd_comm, gh_comm, total_commission],
-                ['营销费 (支出)', 0, dd_mkt, 0, total_marketing],
-                ['处理费 (支出)', 0, 0, gh_proc, total_processing],
-                ['平台补贴 (收入)', uber_credit, dd_credit, 0, total_credit],
-                ['净入账', uber_net, dd_net, gh_net, total_net],
-            ])
-            
-            summary_df = pd.DataFrame(summary_rows[1:], columns=summary_rows[0])
-            summary_df.to_excel(writer, sheet_name='费用汇总', index=False, startrow=1)
-            
-            ws1 = writer.sheets['费用汇总']
-            for col, h in enumerate(summary_rows[0]):
-                ws1.write(0, col, h, fmt_header)
-            ws1.set_column('A:A', 20)
-            ws1.set_column('B:E', 15, fmt_currency)
-            
-            # Sheet 2: 各平台明细
-            for platform, df in results.items():
-                if df is not None:
-                    df.to_excel(writer, sheet_name=f'{platform}明细', index=False)
-        
-        output.seek(0)
+        # 文件在点击下载时才生成（不随每次处理重建）；下载不触发页面重跑
+        st.caption("文件在点击下载时生成；明细超过 Excel 单表行数上限时自动拆分为续表。CSV / Parquet 压缩包生成更快、体积更小。")
+        col_xlsx, col_csv, col_parquet = st.columns(3)
+        with col_xlsx:
+            st.download_button(
+                label="📥 下载 Excel 对账报表",
+                data=functools.partial(build_excel_report, results, cube),
+                file_name=REPORT_FILE_NAME,
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                on_click="ignore"
+            )
+        with col_csv:
+            st.download_button(
+                label="📥 下载明细 (CSV 压缩包)",
+                data=functools.partial(build_detail_archive, results, cube, 'csv'),
+                file_name=DETAIL_ARCHIVE_NAME,
+                mime="application/zip",
+                on_click="ignore"
+            )
+        with col_parquet:
+            st.download_button(
+                label="📥 下载明细 (Parquet 压缩包)",
+                data=functools.partial(build_detail_archive, results, cube, 'parquet'),
+                file_name=DETAIL_ARCHIVE_NAME.replace('.zip', '_parquet.zip'),
+                mime="application/zip",
+                on_click="ignore",
+                disabled=importlib.util.find_spec('pyarrow') is None
+            )
         
-        st.download_button(
-            label="📥 下载 Excel 对账报表",
-            data=output,
-            file_name="Luckin_Fee_Breakdown_Report_v4.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
+        if split_months:
+            cubes = month_cubes(cube)
+            for month, month_results in split_results_by_month(results).items():
+                st.download_button(
+                    label=f"📥 下载 {month} 月度报表",
+                    data=functools.partial(build_excel_report, month_results, cubes.get(month)),
+                    file_name=REPORT_FILE_NAME.replace('.xlsx', f'_{month}.xlsx'),
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    key=f"download_{month}",
+                    on_click="ignore"
+                )
         
         st.info("""
         **报表说明:**
@@ -556,3 +483,13 @@ if st.button("🚀 开始自动化对账处理", type="primary"):
         - 💰 标记的补贴项显示为**正数**（代表收入）
         - 净入账 = CSV中平台报告的实际入账金额
         """)
+
+# ==========================================
+# 🗄️ 台账查询（无需重新上传 CSV）
+# ==========================================
+if os.path.isdir(DEFAULT_LEDGER_DIR):
+    with st.expander(f"🗄️ 台账汇总 ({period.label})"):
+        st.markdown("**按平台 / 月份**")
+        st.dataframe(ledger_summary(DEFAULT_LEDGER_DIR, period), hide_index=True)
+        st.markdown("**同比（去年同期）**")
+        st.dataframe(year_over_year(DEFAULT_LEDGER_DIR, period), hide_index=True)
@@ -0,0 +1,118 @@
+"""Benchmark: per-cell clean_num apply vs vectorized clean_num_series
+
+Usage: python benchmarks/bench_clean_num.py [rows]
+"""
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from recon.numeric import clean_num, clean_num_series  # noqa: E402
+
+
+def _amounts(rng, n, scale=40.0):
+    return np.round(rng.gamma(2.0, scale / 2.0, n), 2)
+
+
+def _with_garbage(rng, values):
+    values = values.astype(object)
+    idx = rng.choice(len(values), size=max(1, len(values) // 200), replace=False)
+    values[idx[::3]] = ''
+    values[idx[1::3]] = 'N/A'
+    values[idx[2::3]] = '--'
+    return values
+
+
+def make_ubereats(rng, n):
+    # 中文表头，纯数字（负数直接带 -），少量空值
+    gross = _amounts(rng, n)
+    df = pd.DataFrame({
+        '销售额（不含税费）': gross,
+        '销售额税费': np.round(gross * 0.08875, 2),
+        '商品优惠（含税）': -np.round(gross * rng.random(n) * 0.2, 2),
+        '平台服务费': -np.round(gross * 0.3, 2),
+        '订单错误调整额': np.where(rng.random(n) < 0.02, -np.round(gross * 0.5, 2), np.nan),
+        '营销调整额': np.round(gross * rng.random(n) * 0.05, 2),
+        '收入总额': np.round(gross * 0.7, 2),
+    })
+    return df
+
+
+def make_doordash(rng, n):
+    # 金额带 $ 与千分位，负数写作 -$x
+    def money(v):
+        return np.array([f"-${-x:,.2f}" if x < 0 else f"${x:,.2f}" for x in v], dtype=object)
+    gross = _amounts(rng, n, scale=300.0)
+    df = pd.DataFrame({
+        '小计': _with_garbage(rng, money(gross)),
+        '税款小计': money(np.round(gross * 0.08875, 2)),
+        '由您出资的折扣': money(-np.round(gross * rng.random(n) * 0.2, 2)),
+        '佣金': money(-np.round(gross * 0.25, 2)),
+        '营销费': money(-np.round(gross * 0.05, 2)),
+        '营销积分': money(np.round(gross * 0.01, 2)),
+        '由 DoorDash 出资的折扣': money(np.round(gross * 0.02, 2)),
+        '净总计': money(np.round(gross * 0.7, 2)),
+    })
+    return df
+
+
+def make_grubhub(rng, n):
+    # 会计格式：负数用括号，千分位
+    def money(v):
+        return np.array([f"({-x:,.2f})" if x < 0 else f"{x:,.2f}" for x in v], dtype=object)
+    gross = _amounts(rng, n, scale=600.0)
+    df = pd.DataFrame({
+        'subtotal': _with_garbage(rng, money(gross)),
+        'subtotal_sales_tax': money(np.round(gross * 0.08875, 2)),
+        'commission': money(-np.round(gross * 0.2, 2)),
+        'delivery_commission': money(-np.round(gross * 0.05, 2)),
+        'processing_fee': money(-np.round(gross * 0.03, 2)),
+        'merchant_funded_promotion': money(-np.round(gross * 0.02, 2)),
+        'merchant_funded_loyalty': money(-np.round(gross * 0.01, 2)),
+        'merchant_net_total': money(np.round(gross * 0.7, 2)),
+    })
+    return df
+
+
+def roundtrip(df):
+    """Write to CSV and read back so column dtypes match a real upload"""
+    buf = io.StringIO()
+    df.to_csv(buf, index=False)
+    buf.seek(0)
+    return pd.read_csv(buf)
+
+
+def bench(name, df):
+    t0 = time.perf_counter()
+    slow = {c: df[c].apply(clean_num) for c in df.columns}
+    t_apply = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    fast = {c: clean_num_series(df[c]) for c in df.columns}
+    t_vec = time.perf_counter() - t0
+
+    for c in df.columns:
+        a = slow[c].astype('float64').to_numpy()
+        b = fast[c].to_numpy()
+        same = (a == b) | (np.isnan(a) & np.isnan(b))
+        if not same.all():
+            raise AssertionError(f"{name}.{c}: {int((~same).sum())} mismatches")
+
+    print(f"{name:<10} {len(df):>9,} rows x {df.shape[1]} cols   "
+          f"apply {t_apply:7.3f}s   vectorized {t_vec:7.3f}s   {t_apply / t_vec:6.1f}x")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    rng = np.random.default_rng(2025)
+    for name, make in [('UberEats', make_ubereats), ('DoorDash', make_doordash),
+                       ('Grubhub', make_grubhub)]:
+        bench(name, roundtrip(make(rng, n)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+"""Benchmark: every processing stage per platform, on synthetic statements of a given size
+
+Usage: python benchmarks/bench_pipeline.py [--rows 10k,100k] [--data bench_data]
+                                           [--stages header,read,clean,stores,process,aggregate,excel,archive]
+                                           [--repeat N] [--no-memory] [--json out.json] [--compare base.json]
+
+Each stage is timed (best of --repeat runs) and, in a separate run, memory-
+profiled with tracemalloc (peak Python + numpy allocations above the inputs).
+--json writes the results with the git commit and library versions, and
+--compare prints the ratio against an earlier JSON, so runs on different
+commits of the same machine can be compared directly.
+"""
+import argparse
+import datetime as dt
+import importlib.util
+import json
+import os
+import platform as platform_info
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from generate_statements import PLATFORMS, ensure_statement, parse_rows  # noqa: E402
+from recon.aggregate import aggregate  # noqa: E402
+from recon.numeric import clean_num_series  # noqa: E402
+from recon.platforms import PLATFORM_SPECS  # noqa: E402
+from recon.processors import PLATFORM_PROCESSORS, READ_OPTIONS  # noqa: E402
+from recon.readers import CSV_ENGINE, read_statement, sniff_header  # noqa: E402
+from recon.report import write_detail_archive, write_excel_report  # noqa: E402
+from recon.stores import map_store_ids  # noqa: E402
+
+STAGES = ['header', 'read', 'clean', 'stores', 'process', 'aggregate', 'excel', 'archive']
+
+# 超过这个行数默认不测 Excel 导出（1000 万行 xlsx 要跑很久）
+MAX_EXCEL_ROWS = 1_000_000
+
+
+def _store_text(df, platform):
+    cols = PLATFORM_SPECS[platform].store_columns
+    text = df[cols[0]].astype(str)
+    for col in cols[1:]:
+        text = text + ' ' + df[col].astype(str)
+    return text
+
+
+def stage_runners(platform, path, workdir):
+    """{stage: (setup, run)} - setup builds the stage input untimed, run(input) is what gets measured"""
+    options = READ_OPTIONS[platform]
+    money = [c for c in options.get('columns', []) + list(options.get('fuzzy_columns', ()))
+             if c not in options.get('text_columns', ())]
+
+    def read():
+        with open(path, 'rb') as f:
+            return read_statement(f, **options)
+
+    def header(p):
+        with open(p, 'rb') as f:
+            return sniff_header(f, options['target_columns'])
+
+    def process():
+        with open(path, 'rb') as f:
+            return PLATFORM_PROCESSORS[platform](f, period=None)
+
+    def money_frame():
+        df = read()
+        return df[[c for c in df.columns if any(m in c for m in money)]]
+
+    return {
+        'header': (lambda: path, header),
+        'read': (lambda: None, lambda _: read()),
+        'clean': (money_frame, lambda df: [clean_num_series(df[c]) for c in df.columns]),
+        'stores': (lambda: _store_text(read(), platform),
+                   lambda text: map_store_ids(text, PLATFORM_SPECS[platform].store_rule)),
+        'process': (lambda: None, lambda _: process()),
+        'aggregate': (lambda: {platform: process()}, aggregate),
+        'excel': (lambda: {platform: process()},
+                  lambda results: write_excel_report(results, os.path.join(workdir, 'report.xlsx'))),
+        'archive': (lambda: {platform: process()},
+                    lambda results: write_detail_archive(results, os.path.join(workdir, 'detail.zip'))),
+    }
+
+
+def measure(setup, run, repeat, memory):
+    """(best wall seconds, tracemalloc peak MB or None)"""
+    data = setup()
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        run(data)
+        best = min(best, time.perf_counter() - t0)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        run(data)
+        peak = (tracemalloc.get_traced_memory()[1] - base) / 1e6
+        tracemalloc.stop()
+    return best, peak
+
+
+def git_commit():
+    try:
+        sha = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                             text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return sha + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    return {
+        'commit': git_commit(),
+        'timestamp': dt.datetime.now().isoformat(timespec='seconds'),
+        'python': platform_info.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'pyarrow': (__import__('pyarrow').__version__ if importlib.util.find_spec('pyarrow') else None),
+        'csv_engine': CSV_ENGINE,
+        'machine': platform_info.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def print_results(results, baseline=None):
+    base = {(r['platform'], r['rows'], r['stage']): r for r in (baseline or {}).get('results', [])}
+    print(f"{'platform':<10}{'rows':>12}  {'stage':<10}{'seconds':>10}{'rows/s':>14}{'peak MB':>10}"
+          + (f"{'vs base':>10}" if base else ''))
+    for r in results:
+        line = (f"{r['platform']:<10}{r['rows']:>12,}  {r['stage']:<10}{r['seconds']:>10.3f}"
+                f"{r['rows_per_sec']:>14,.0f}{r['peak_mb'] if r['peak_mb'] is not None else float('nan'):>10.1f}")
+        old = base.get((r['platform'], r['rows'], r['stage']))
+        if old:
+            line += f"{old['seconds'] / r['seconds']:>9.2f}x"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time and memory-profile each processing stage')
+    parser.add_argument('--rows', default='10k,100k', help='comma-separated sizes: 10k,100k,1M,10M')
+    parser.add_argument('--data', default=os.path.join(ROOT, 'bench_data'),
+                        help='where synthetic statements are generated / reused')
+    parser.add_argument('--platforms', default=','.join(PLATFORMS))
+    parser.add_argument('--stages', default=','.join(STAGES))
+    parser.add_argument('--repeat', type=int, help='timed runs per stage (default: 3 up to 100k rows, else 1)')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    parser.add_argument('--json', help='write results as JSON to this path')
+    parser.add_argument('--compare', help='earlier JSON to compare against (ratio > 1 means faster now)')
+    args = parser.parse_args(argv)
+
+    stages = args.stages.split(',')
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(sorted(unknown))}")
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.rows.split(','):
+            rows = parse_rows(size)
+            for platform in args.platforms.split(','):
+                path = ensure_statement(args.data, platform, size)
+                runners = stage_runners(platform, path, workdir)
+                for stage in stages:
+                    if stage == 'excel' and rows > MAX_EXCEL_ROWS and args.stages == parser.get_default('stages'):
+                        continue
+                    repeat = args.repeat or (3 if rows <= 100_000 else 1)
+                    seconds, peak = measure(*runners[stage], repeat, not args.no_memory)
+                    results.append({'platform': platform, 'rows': rows, 'stage': stage, 'seconds': seconds,
+                                    'rows_per_sec': rows / seconds if seconds else 0.0, 'peak_mb': peak})
+                    print(f"  {platform} {size} {stage}: {seconds:.3f}s", file=sys.stderr)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
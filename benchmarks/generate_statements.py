@@ -0,0 +1,237 @@
+"""Synthetic platform statements - realistic UberEats / DoorDash / Grubhub CSVs at any size
+
+Usage: python benchmarks/generate_statements.py [--rows 10k,100k,1M,10M] [--out bench_data]
+                                               [--platforms UberEats,DoorDash,Grubhub] [--seed 2025]
+
+Files are written as <out>/<platform>_<rows>.csv in blocks, so 10M rows
+never sit in memory at once. The same seed always produces the same bytes.
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+PLATFORMS = ['UberEats', 'DoorDash', 'Grubhub']
+SIZES = ['10k', '100k', '1M', '10M']
+BLOCK_ROWS = 200_000
+
+# 各平台账单里的门店写法（含少量无法识别的门店），权重大致对应单量
+STORE_NAMES = {
+    'UberEats': (['Luckin Coffee (755 Broadway)', 'Luckin Coffee 6th Ave', 'Luckin Coffee - Maiden Lane',
+                  'Luckin Coffee 37th St', 'Luckin Coffee 8th Ave', 'Luckin Coffee Fulton St', 'Luckin Pop-up'],
+                 [0.22, 0.18, 0.16, 0.14, 0.14, 0.14, 0.02]),
+    'DoorDash': (['Luckin Coffee (755 Broadway)', 'Luckin Coffee (800 6th Ave)', 'Luckin Coffee (100 Maiden Ln)',
+                  'Luckin Coffee (37 W 37th St)', 'Luckin Coffee (901 8th Ave)', 'Luckin Coffee (102 Fulton St)',
+                  'Luckin Coffee'],
+                 [0.22, 0.18, 0.16, 0.14, 0.14, 0.14, 0.02]),
+    'Grubhub': ([('Luckin Coffee', '755 Broadway'), ('Luckin Coffee', '800 6th Ave'),
+                 ('Luckin Coffee', '100 Maiden Ln'), ('Luckin Coffee', '37 W 37th St'),
+                 ('Luckin Coffee', '901 8th Ave'), ('Luckin Coffee', '102 Fulton St'),
+                 ('Luckin Coffee', '')],
+                [0.22, 0.18, 0.16, 0.14, 0.14, 0.14, 0.02]),
+}
+
+UBEREATS_PREAMBLE = [
+    'Uber Eats 付款明细报表',
+    '商户名称: Luckin Coffee US',
+    '报表期间: {start} 至 {end}',
+    '说明: 金额单位为美元，负数表示平台扣款',
+    '',
+]
+GRUBHUB_PREAMBLE = [
+    'Grubhub for Restaurants - Transaction History',
+    'Date range: {start} - {end}',
+    '',
+]
+
+
+def parse_rows(text):
+    """'10k' / '1M' / '2500' -> int"""
+    text = text.strip().lower()
+    scale = {'k': 1_000, 'm': 1_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def _amounts(rng, n, scale=12.0):
+    # 咖啡订单金额：多数 5~30 美元，长尾到几百（团单）
+    base = rng.gamma(2.2, scale / 2.2, n)
+    bulk = rng.random(n) < 0.005
+    base[bulk] *= rng.uniform(10, 60, bulk.sum())
+    return np.round(base + 3.5, 2)
+
+
+def _dates(rng, n, year, month):
+    # 绝大多数落在账期内，约 3% 来自上月（周报与月报重叠的部分）
+    start = pd.Timestamp(year, month, 1)
+    days = pd.Period(start, 'M').days_in_month
+    offset = rng.integers(0, days, n)
+    spill = rng.random(n) < 0.03
+    offset[spill] = -rng.integers(1, 8, spill.sum())
+    return (start + pd.to_timedelta(offset, unit='D')).strftime('%m/%d/%Y')
+
+
+def _pick(rng, n, platform):
+    choices, weights = STORE_NAMES[platform]
+    return rng.choice(len(choices), size=n, p=weights)
+
+
+def _dollar(values):
+    # DoorDash: $1,234.56 / -$3.20
+    text = pd.Series(np.abs(values)).map('${:,.2f}'.format)
+    return np.where(values < 0, '-' + text, text)
+
+
+def _accounting(values):
+    # Grubhub: 1,234.56 / (3.20)
+    text = pd.Series(np.abs(values)).map('{:,.2f}'.format)
+    return np.where(values < 0, '(' + text + ')', text)
+
+
+def _plain(values, blank_zero=False):
+    text = pd.Series(values).map('{:.2f}'.format).to_numpy()
+    return np.where(values == 0, '', text) if blank_zero else text
+
+
+def _ids(first, n, prefix, width, salt):
+    # 行号乘奇数取模是 16**width 内的双射：看起来随机，但整份账单内不重复
+    space = 16 ** width
+    values = (np.arange(first, first + n, dtype=np.uint64) * np.uint64(2654435761) + np.uint64(salt)) % np.uint64(space)
+    return pd.Series(values).map(lambda v: f'{prefix}{v:0{width}x}')
+
+
+def ubereats_block(rng, first, n, year, month):
+    gross = _amounts(rng, n)
+    tax = np.round(gross * 0.08875, 2)
+    promo = -np.round(gross * (rng.random(n) < 0.3) * rng.uniform(0.1, 0.5, n), 2)
+    fee = -np.round(gross * 0.3, 2)
+    error = -np.round(gross * (rng.random(n) < 0.01), 2)
+    credit = np.round(-promo * (rng.random(n) < 0.2) * 0.5, 2)
+    net = np.round(gross + tax + promo + fee + error + credit, 2)
+    stores = np.array(STORE_NAMES['UberEats'][0], dtype=object)[_pick(rng, n, 'UberEats')]
+    return pd.DataFrame({
+        '订单号': _ids(first, n, '', 8, 11).str.upper(),
+        '订单日期': _dates(rng, n, year, month),
+        '订单接受时间': pd.Series(rng.integers(7 * 60, 21 * 60, n)).map(lambda m: f'{m // 60:02d}:{m % 60:02d}'),
+        '餐厅名称': stores,
+        '订单状态': np.where(rng.random(n) < 0.01, '已取消', '已完成'),
+        '销售额（不含税费）': _plain(gross),
+        '销售额税费': _plain(tax),
+        '商品优惠（含税）': _plain(promo, blank_zero=True),
+        '平台服务费': _plain(fee),
+        '订单错误调整额': _plain(error, blank_zero=True),
+        '营销调整额': _plain(credit, blank_zero=True),
+        '收入总额': _plain(net),
+        '备注': np.where(rng.random(n) < 0.05, '顾客备注: 少冰, 不要吸管', ''),
+    })
+
+
+def doordash_block(rng, first, n, year, month):
+    gross = _amounts(rng, n)
+    tax = np.round(gross * 0.08875, 2)
+    merchant_promo = -np.round(gross * (rng.random(n) < 0.25) * 0.2, 2)
+    dd_promo = np.round(gross * (rng.random(n) < 0.1) * 0.1, 2)
+    commission = -np.round(gross * 0.25, 2)
+    marketing = -np.round((rng.random(n) < 0.15) * 1.0, 2)
+    error = -np.round(gross * (rng.random(n) < 0.005), 2)
+    points = np.round((rng.random(n) < 0.05) * 0.5, 2)
+    net = np.round(gross + tax + merchant_promo + commission + marketing + error + points, 2)
+    stores = np.array(STORE_NAMES['DoorDash'][0], dtype=object)[_pick(rng, n, 'DoorDash')]
+    return pd.DataFrame({
+        'DoorDash 订单 ID': _ids(first, n, '', 8, 23),
+        '时间戳本地日期': _dates(rng, n, year, month),
+        '店铺名称': stores,
+        '小计': _dollar(gross),
+        '税款小计': _dollar(tax),
+        '由您出资的折扣': _dollar(merchant_promo),
+        '佣金': _dollar(commission),
+        '营销费': _dollar(marketing),
+        '错误费用': _dollar(error),
+        '营销积分': _dollar(points),
+        '由 DoorDash 出资的折扣': _dollar(dd_promo),
+        '净总计': _dollar(net),
+        '描述': np.where(rng.random(n) < 0.02, 'Adjustment, see order details', 'Delivery'),
+    })
+
+
+def grubhub_block(rng, first, n, year, month):
+    gross = _amounts(rng, n)
+    tax = np.round(gross * 0.08875, 2)
+    commission = -np.round(gross * 0.2, 2)
+    delivery = -np.round(gross * 0.1, 2)
+    processing = -np.round(gross * 0.03 + 0.3, 2)
+    promo = -np.round(gross * (rng.random(n) < 0.2) * 0.15, 2)
+    loyalty = -np.round((rng.random(n) < 0.05) * 2.0, 2)
+    net = np.round(gross + tax + commission + delivery + processing + promo + loyalty, 2)
+    names, addresses = zip(*STORE_NAMES['Grubhub'][0])
+    picked = _pick(rng, n, 'Grubhub')
+    return pd.DataFrame({
+        'order_number': _ids(first, n, 'GH', 10, 37),
+        'transaction_date': _dates(rng, n, year, month),
+        'transaction_type': np.where(rng.random(n) < 0.01, 'Adjustment', 'Prepaid Order'),
+        'store_name': np.array(names, dtype=object)[picked],
+        'street_address': np.array(addresses, dtype=object)[picked],
+        'subtotal': _accounting(gross),
+        'subtotal_sales_tax': _accounting(tax),
+        'commission': _accounting(commission),
+        'delivery_commission': _accounting(delivery),
+        'processing_fee': _accounting(processing),
+        'merchant_funded_promotion': _accounting(promo),
+        'merchant_funded_loyalty': _accounting(loyalty),
+        'merchant_net_total': _accounting(net),
+    })
+
+
+BLOCKS = {'UberEats': ubereats_block, 'DoorDash': doordash_block, 'Grubhub': grubhub_block}
+PREAMBLES = {'UberEats': UBEREATS_PREAMBLE, 'DoorDash': [], 'Grubhub': GRUBHUB_PREAMBLE}
+
+
+def generate(platform, rows, path, seed=2025, year=2025, month=10):
+    """Write a synthetic statement CSV for one platform; returns the path"""
+    rng = np.random.default_rng([seed, PLATFORMS.index(platform), rows])
+    start = pd.Timestamp(year, month, 1)
+    end = start + pd.offsets.MonthEnd(0)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for line in PREAMBLES[platform]:
+            f.write(line.format(start=start.date(), end=end.date()) + '\n')
+        header = True
+        for first in range(0, rows, BLOCK_ROWS):
+            block = BLOCKS[platform](rng, first, min(BLOCK_ROWS, rows - first), year, month)
+            block.to_csv(f, index=False, header=header, lineterminator='\n')
+            header = False
+    return path
+
+
+def statement_path(out_dir, platform, size):
+    return os.path.join(out_dir, f'{platform}_{size}.csv')
+
+
+def ensure_statement(out_dir, platform, size, seed=2025):
+    """Path of the synthetic statement, generating it first if it is not there yet"""
+    path = statement_path(out_dir, platform, size)
+    if not os.path.exists(path):
+        generate(platform, parse_rows(size), path, seed)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate synthetic platform statement CSVs')
+    parser.add_argument('--rows', default='10k,100k', help=f'comma-separated sizes, e.g. {",".join(SIZES)}')
+    parser.add_argument('--out', default='bench_data', help='output directory (default: bench_data)')
+    parser.add_argument('--platforms', default=','.join(PLATFORMS))
+    parser.add_argument('--seed', type=int, default=2025)
+    parser.add_argument('--force', action='store_true', help='regenerate files that already exist')
+    args = parser.parse_args(argv)
+
+    for size in args.rows.split(','):
+        for platform in args.platforms.split(','):
+            path = statement_path(args.out, platform, size)
+            if args.force or not os.path.exists(path):
+                generate(platform, parse_rows(size), path, args.seed)
+            print(f"{path}  {os.path.getsize(path) / 1e6:8.1f} MB", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,7 @@
+"""Luckin delivery-platform reconciliation core
+
+Importable without Streamlit. Submodules load pandas on import, so the
+package itself stays light and the CLI can parse arguments before paying
+for the heavy imports.
+"""
+__version__ = '4.1'
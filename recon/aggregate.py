@@ -0,0 +1,56 @@
+"""Aggregation engine - every report metric in one groupby pass, by vendor x store x day"""
+import pandas as pd
+
+from .numeric import is_cents
+from .platforms import METRICS, PLATFORM_SPECS
+
+# 跨平台统一口径：指标 -> 各平台明细里的对应列（平台没有的指标记 0），见 platforms.py
+METRIC_COLUMNS = {name: spec.metrics for name, spec in PLATFORM_SPECS.items()}
+CUBE_KEYS = ['Vendor', 'Store_Standard', 'Date', 'Month']
+CUBE_COLUMNS = CUBE_KEYS + ['Orders'] + METRICS
+
+def _platform_cube(platform, df):
+    sources = {metric: col for metric, col in METRIC_COLUMNS[platform].items() if col in df.columns}
+    if 'Date' in df.columns:
+        groups = df.groupby(['Store_Standard', 'Date'], sort=False, dropna=False, observed=True)
+        part = groups[list(dict.fromkeys(sources.values()))].sum()
+        part.insert(0, 'Orders', groups.size())
+        part = part.reset_index()
+        part['Month'] = part['Date'].dt.strftime('%Y-%m')
+    else:
+        # 分块模式的门店汇总：已按月聚合，没有日粒度
+        cols = ['Orders'] + list(dict.fromkeys(sources.values()))
+        part = df.groupby(['Store_Standard', 'Month'], sort=False, dropna=False, observed=True)[cols].sum().reset_index()
+        part['Date'] = pd.NaT
+    for metric, col in sources.items():
+        part[metric] = part[col]
+    part['Vendor'] = platform
+    part = part.reindex(columns=CUBE_COLUMNS).fillna({m: 0.0 for m in METRICS})
+    if sources and all(is_cents(df[col]) for col in sources.values()):
+        # 紧凑模式（整数分）：平台没有的指标也记整数 0，整个 cube 保持精确整数
+        part[METRICS] = part[METRICS].astype('int64')
+    return part
+
+def aggregate(results):
+    """{platform: detail frame or rollup} -> one row per vendor x store x day with orders and every metric"""
+    parts = [_platform_cube(platform, df) for platform, df in results.items()
+             if df is not None and len(df) > 0]
+    if not parts:
+        return pd.DataFrame(columns=CUBE_COLUMNS)
+    cube = pd.concat(parts, ignore_index=True)
+    cube['Orders'] = cube['Orders'].astype('int64')
+    return cube
+
+def vendor_totals(cube, vendors=None):
+    """Orders and metric totals per vendor (every vendor listed, zeros where there is no data)"""
+    totals = cube.groupby('Vendor', observed=True)[['Orders'] + METRICS].sum()
+    return totals.reindex(vendors, fill_value=0) if vendors is not None else totals
+
+def store_totals(cube):
+    """Orders and metric totals per vendor x store"""
+    return (cube.groupby(['Vendor', 'Store_Standard'], sort=True, observed=True)[['Orders'] + METRICS].sum()
+            .reset_index())
+
+def month_cubes(cube):
+    """{YYYY-MM: cube slice} - per-month reports straight from the cube"""
+    return {month: part for month, part in cube.groupby('Month', sort=True, observed=True)}
@@ -0,0 +1,296 @@
+"""Bank deposit matching - platform payout batches paired with bank statement credits
+
+Payouts are batched per vendor x store x payout week (see PAYOUT_SCHEDULE)
+and expected in the bank PAYOUT_LAG_DAYS after the week closes. Matching is
+all hashed joins: amounts are bucketed by the tolerance, so a payout is only
+compared with deposits in its own and the neighbouring buckets, then the
+date window and vendor are checked. Three passes run in order:
+
+1. one payout batch <-> one deposit
+2. several batches paid as one transfer (a vendor's stores, same payout date)
+3. one batch paid as several deposits (same vendor, same day)
+"""
+import io
+import os
+import re
+
+import pandas as pd
+
+from .aggregate import aggregate
+from .numeric import clean_num_series, to_cents, to_dollars
+from .platforms import PLATFORM_SPECS
+from .readers import open_source
+
+BANK_MATCH_FILE_NAME = "Luckin_Bank_Reconciliation.csv"
+
+# 各平台打款周期（结算周截止日）与到账延迟（天），见 platforms.py
+PAYOUT_SCHEDULE = {name: spec.payout_schedule for name, spec in PLATFORM_SPECS.items()}
+PAYOUT_LAG_DAYS = {name: spec.payout_lag_days for name, spec in PLATFORM_SPECS.items()}
+
+DEFAULT_TOLERANCE = 0.01
+DEFAULT_WINDOW_DAYS = 5
+
+# 银行流水摘要里的平台关键字
+DEPOSIT_VENDORS = {name: spec.deposit_pattern for name, spec in PLATFORM_SPECS.items() if spec.deposit_pattern}
+
+# 银行 CSV 常见列名（按优先级）
+BANK_COLUMNS = {
+    'Date': ['Date', 'Posting Date', 'Posted Date', 'Transaction Date', '交易日期', '记账日期', '日期'],
+    'Amount': ['Amount', 'Credit', 'Deposit', 'Deposits', '金额', '收入金额', '贷方金额'],
+    'Description': ['Description', 'Memo', 'Name', 'Payee', 'Details', '摘要', '交易描述', '描述'],
+    'Deposit_ID': ['Reference', 'Transaction ID', 'FITID', 'Check or Slip #', '流水号', '交易流水号'],
+}
+
+DEPOSIT_COLUMNS = ['Deposit_ID', 'Date', 'Amount', 'Vendor', 'Description']
+MATCH_COLUMNS = ['Match_Type', 'Vendor', 'Store_Standard', 'Batch_IDs', 'Expected_Date', 'Payout',
+                 'Deposit_IDs', 'Deposit_Date', 'Deposit_Amount', 'Difference', 'Days_Off']
+
+def _deposit_vendor(description):
+    vendor = pd.Series(None, index=description.index, dtype=object)
+    text = description.fillna('').astype(str).str.upper()
+    for platform, pattern in DEPOSIT_VENDORS.items():
+        vendor = vendor.mask(vendor.isna() & text.str.contains(pattern, regex=True), platform)
+    return vendor
+
+def _pick(columns, candidates):
+    lookup = {str(c).strip().lower(): c for c in columns}
+    return next((lookup[c.lower()] for c in candidates if c.lower() in lookup), None)
+
+def _read_bank_csv(f):
+    raw = pd.read_csv(f, dtype=str)
+    cols = {name: _pick(raw.columns, candidates) for name, candidates in BANK_COLUMNS.items()}
+    if cols['Date'] is None or cols['Amount'] is None:
+        raise ValueError(f"bank statement needs a date and an amount column, got {list(raw.columns)}")
+    return pd.DataFrame({
+        'Deposit_ID': raw[cols['Deposit_ID']] if cols['Deposit_ID'] else None,
+        'Date': pd.to_datetime(raw[cols['Date']], errors='coerce', format='mixed'),
+        'Amount': clean_num_series(raw[cols['Amount']]),
+        'Description': raw[cols['Description']] if cols['Description'] else '',
+    })
+
+def _read_ofx(text):
+    # OFX/QFX（SGML 或 XML）：每笔交易一个 <STMTTRN> 块，结束标签可有可无
+    blocks = pd.Series(re.split(r'<STMTTRN>', text, flags=re.IGNORECASE)[1:], dtype=object)
+    blocks = blocks.str.replace(r'</STMTTRN>.*', '', regex=True, flags=re.IGNORECASE | re.DOTALL)
+
+    def field(tag):
+        return blocks.str.extract(rf'<{tag}>\s*([^<\r\n]*)', flags=re.IGNORECASE)[0].str.strip()
+
+    name, memo = field('NAME'), field('MEMO')
+    return pd.DataFrame({
+        'Deposit_ID': field('FITID'),
+        'Date': pd.to_datetime(field('DTPOSTED').str[:8], format='%Y%m%d', errors='coerce'),
+        'Amount': clean_num_series(field('TRNAMT')),
+        'Description': name.fillna('').str.cat(memo.fillna(''), sep=' ').str.strip(),
+    })
+
+def read_bank_statement(source, name=None):
+    """Bank credits from a CSV or OFX/QFX statement: Deposit_ID, Date, Amount (int64 cents), Vendor, Description
+
+    Debits are dropped. Vendor is recognised from the description (UBER /
+    DOORDASH / GRUBHUB) and left empty when it cannot be told.
+    """
+    with open_source(source) as f:
+        data = f.read()
+    text = data.decode('utf-8-sig', errors='replace') if isinstance(data, bytes) else data
+    name = name or (os.fspath(source) if isinstance(source, (str, os.PathLike)) else getattr(source, 'name', ''))
+    is_ofx = name.lower().endswith(('.ofx', '.qfx')) or re.search(r'OFXHEADER|<OFX>', text[:4096], re.IGNORECASE)
+    deposits = _read_ofx(text) if is_ofx else _read_bank_csv(io.StringIO(text))
+
+    deposits = deposits[deposits['Amount'] > 0].dropna(subset=['Date']).reset_index(drop=True)
+    label = os.path.basename(name) or 'bank'
+    missing = deposits['Deposit_ID'].isna() | (deposits['Deposit_ID'].astype(str).str.strip() == '')
+    deposits['Deposit_ID'] = deposits['Deposit_ID'].astype(object).where(
+        ~missing, [f'{label}#{i + 1}' for i in range(len(deposits))])
+    deposits['Amount'] = to_cents(deposits['Amount'])
+    deposits['Vendor'] = _deposit_vendor(deposits['Description'])
+    return deposits[DEPOSIT_COLUMNS]
+
+def read_bank_statements(sources):
+    """Deposits of several bank statements (paths or uploaded files)
+
+    Overlapping exports are deduplicated by the bank's transaction id; rows
+    without one cannot be told apart from a genuine second deposit of the
+    same amount, so they are all kept.
+    """
+    frames = [read_bank_statement(source) for source in sources]
+    if not frames:
+        return pd.DataFrame(columns=DEPOSIT_COLUMNS)
+    return pd.concat(frames, ignore_index=True).drop_duplicates('Deposit_ID').reset_index(drop=True)
+
+def payout_batches(results, cube=None):
+    """Net payout per vendor x store x payout week, with the expected deposit date (amounts in int64 cents)"""
+    cube = aggregate(results) if cube is None else cube
+    daily = cube.dropna(subset=['Date'])
+    parts = []
+    for vendor, rows in daily.groupby('Vendor', sort=False, observed=True):
+        week_end = rows['Date'].dt.to_period(PAYOUT_SCHEDULE.get(vendor, 'W-SUN')).dt.end_time.dt.normalize()
+        part = (rows.assign(Week_End=week_end)
+                .groupby(['Store_Standard', 'Week_End'], sort=True, observed=True)['Net_Payout'].sum()
+                .reset_index())
+        part['Vendor'] = vendor
+        part['Expected_Date'] = part['Week_End'] + pd.Timedelta(days=PAYOUT_LAG_DAYS.get(vendor, 0))
+        parts.append(part)
+    if not parts:
+        return pd.DataFrame(columns=['Batch_ID', 'Vendor', 'Store_Standard', 'Week_End', 'Expected_Date', 'Amount'])
+    batches = pd.concat(parts, ignore_index=True)
+    batches['Amount'] = to_cents(to_dollars(batches['Net_Payout']))
+    batches = batches[batches['Amount'] > 0]
+    batches['Batch_ID'] = (batches['Vendor'] + '|' + batches['Store_Standard'].astype(str) + '|'
+                           + batches['Week_End'].dt.strftime('%Y-%m-%d'))
+    return batches[['Batch_ID', 'Vendor', 'Store_Standard', 'Week_End', 'Expected_Date', 'Amount']].reset_index(drop=True)
+
+def _band_join(payouts, deposits, tolerance):
+    """Payout x deposit pairs whose amounts differ by at most tolerance cents - a hashed join on amount buckets"""
+    width = tolerance + 1
+    left = payouts.assign(_bucket=payouts['Amount'] // width)
+    # 差额 ≤ 容差的两笔金额，桶号最多差 1
+    right = pd.concat([deposits.assign(_bucket=deposits['Amount'] // width + k) for k in (-1, 0, 1)],
+                      ignore_index=True)
+    pairs = left.merge(right, on='_bucket', suffixes=('_payout', '_deposit'))
+    pairs['Difference'] = pairs['Amount_deposit'] - pairs['Amount_payout']
+    return pairs[pairs['Difference'].abs() <= tolerance].drop(columns='_bucket')
+
+def _pair(payouts, deposits, tolerance, window_days):
+    """Best one-to-one pairing of payout units with deposit units (closest amount, then closest date)"""
+    if len(payouts) == 0 or len(deposits) == 0:
+        return None
+    pairs = _band_join(payouts, deposits, tolerance)
+    pairs['Days_Off'] = (pairs['Date_deposit'] - pairs['Date_payout']).dt.days
+    vendor_ok = pairs['Vendor_deposit'].isna() | (pairs['Vendor_deposit'] == pairs['Vendor_payout'])
+    pairs = pairs[vendor_ok & (pairs['Days_Off'].abs() <= window_days)]
+    pairs = pairs.assign(_amount=pairs['Difference'].abs(), _days=pairs['Days_Off'].abs()).sort_values(
+        ['_amount', '_days'], kind='stable')
+    # 贪心一对一：每轮取各自最优且不冲突的配对，剔除已用的再继续
+    chosen = []
+    while len(pairs):
+        best = pairs.drop_duplicates('Unit_payout').drop_duplicates('Unit_deposit')
+        chosen.append(best)
+        pairs = pairs[~pairs['Unit_payout'].isin(best['Unit_payout']) & ~pairs['Unit_deposit'].isin(best['Unit_deposit'])]
+    return pd.concat(chosen, ignore_index=True) if chosen else None
+
+def _units(frame, key, ids, date, by=None):
+    """Matching units: single rows (by=None) or sums of rows grouped by `by`, with their member ids"""
+    if by is None:
+        units = frame.assign(Members=frame[ids].map(lambda i: [i]))
+    else:
+        groups = frame.groupby(by, sort=False, dropna=False)
+        units = groups.agg(Amount=('Amount', 'sum'), Members=(ids, list)).reset_index()
+        units = units[units['Members'].str.len() > 1]
+    units = units.rename(columns={date: 'Date'}).reset_index(drop=True)
+    units['Unit'] = key + units.index.astype(str)
+    return units[['Unit', 'Vendor', 'Date', 'Amount', 'Members']]
+
+def _deposit_pairs(deposits, key):
+    """Two deposits of one vendor on the same or the next day, as one unit - joined on vendor x day, not all pairs"""
+    known = deposits.dropna(subset=['Vendor'])[['Deposit_ID', 'Vendor', 'Date', 'Amount']]
+    right = pd.concat([known.assign(Day=known['Date'] - pd.Timedelta(days=k), Lag=k) for k in (0, 1)],
+                      ignore_index=True)
+    pairs = known.assign(Day=known['Date']).merge(right, on=['Vendor', 'Day'], suffixes=('_a', '_b'))
+    # 同一天的两笔会正反各配一次，按 ID 只留一个；隔天的只出现一次（a 在前一天），原样保留
+    pairs = pairs[(pairs['Lag'] == 1) | (pairs['Deposit_ID_a'].astype(str) < pairs['Deposit_ID_b'].astype(str))]
+    units = pd.DataFrame({
+        'Vendor': pairs['Vendor'].to_numpy(),
+        'Date': pairs['Date_a'].to_numpy(),
+        'Amount': (pairs['Amount_a'] + pairs['Amount_b']).to_numpy(),
+        'Members': [[a, b] for a, b in zip(pairs['Deposit_ID_a'], pairs['Deposit_ID_b'])],
+    })
+    units['Unit'] = key + units.index.astype(str)
+    return units[['Unit', 'Vendor', 'Date', 'Amount', 'Members']]
+
+def _disjoint(paired):
+    # 组合单元之间可能共用同一笔批次/存款：按配对质量顺序保留先出现的
+    used_payouts, used_deposits, keep = set(), set(), []
+    for payouts, deposits in zip(paired['Members_payout'], paired['Members_deposit']):
+        ok = used_payouts.isdisjoint(payouts) and used_deposits.isdisjoint(deposits)
+        keep.append(ok)
+        if ok:
+            used_payouts.update(payouts)
+            used_deposits.update(deposits)
+    return paired[keep]
+
+# 匹配轮次：(类型, 打款单元, 到账单元)，依次在剩余的批次/存款上进行
+MATCH_PASSES = [
+    ('one_to_one',
+     lambda b: _units(b, 'p', 'Batch_ID', 'Expected_Date'),
+     lambda d: _units(d, 'd', 'Deposit_ID', 'Date')),
+    ('combined',
+     lambda b: _units(b, 'p', 'Batch_ID', 'Expected_Date', by=['Vendor', 'Expected_Date']),
+     lambda d: _units(d, 'd', 'Deposit_ID', 'Date')),
+    ('split',
+     lambda b: _units(b, 'p', 'Batch_ID', 'Expected_Date'),
+     lambda d: pd.concat([_units(d.dropna(subset=['Vendor']), 'g', 'Deposit_ID', 'Date', by=['Vendor', 'Date']),
+                          _deposit_pairs(d, 'x')], ignore_index=True)),
+]
+
+def match_deposits(batches, deposits, tolerance=DEFAULT_TOLERANCE, window_days=DEFAULT_WINDOW_DAYS):
+    """Pair payout batches with bank deposits; returns {'matches', 'unmatched_payouts', 'unmatched_deposits'}
+
+    tolerance is in dollars per match, window_days the allowed distance
+    between the expected and actual deposit date. Amounts come back in dollars.
+    """
+    tol = int(round(tolerance * 100))
+    stores = batches.set_index('Batch_ID')['Store_Standard'] if len(batches) else pd.Series(dtype=object)
+    open_batches, open_deposits = batches, deposits
+    matches = []
+    for match_type, payout_units, deposit_units in MATCH_PASSES:
+        while len(open_batches) and len(open_deposits):
+            paired = _pair(payout_units(open_batches), deposit_units(open_deposits), tol, window_days)
+            if paired is None or len(paired) == 0:
+                break
+            paired = _disjoint(paired).assign(Match_Type=match_type)
+            matches.append(paired)
+            open_batches = open_batches[~open_batches['Batch_ID'].isin(set(paired['Members_payout'].explode()))]
+            open_deposits = open_deposits[~open_deposits['Deposit_ID'].isin(set(paired['Members_deposit'].explode()))]
+
+    if matches:
+        found = pd.concat(matches, ignore_index=True)
+        out = pd.DataFrame({
+            'Match_Type': found['Match_Type'],
+            'Vendor': found['Vendor_payout'],
+            'Store_Standard': found['Members_payout'].map(
+                lambda ids: '; '.join(dict.fromkeys(str(stores.get(i, '')) for i in ids))),
+            'Batch_IDs': found['Members_payout'].str.join('; '),
+            'Expected_Date': found['Date_payout'],
+            'Payout': found['Amount_payout'],
+            'Deposit_IDs': found['Members_deposit'].map(lambda ids: '; '.join(map(str, ids))),
+            'Deposit_Date': found['Date_deposit'],
+            'Deposit_Amount': found['Amount_deposit'],
+            'Difference': found['Difference'],
+            'Days_Off': found['Days_Off'],
+        })
+    else:
+        out = pd.DataFrame(columns=MATCH_COLUMNS)
+    money = ['Payout', 'Deposit_Amount', 'Difference']
+    out[money] = out[money].astype('int64') / 100
+    unmatched_payouts = open_batches.assign(Amount=open_batches['Amount'] / 100).reset_index(drop=True)
+    unmatched_deposits = open_deposits.assign(Amount=open_deposits['Amount'] / 100).reset_index(drop=True)
+    return {'matches': out.sort_values(['Vendor', 'Expected_Date'], kind='stable').reset_index(drop=True),
+            'unmatched_payouts': unmatched_payouts, 'unmatched_deposits': unmatched_deposits}
+
+def reconciliation_table(matched):
+    """One flat table for export: matches, then unmatched payouts and unmatched deposits (Match_Type says which)"""
+    payouts = matched['unmatched_payouts']
+    deposits = matched['unmatched_deposits']
+    rows = [
+        matched['matches'],
+        pd.DataFrame({'Match_Type': 'unmatched_payout', 'Vendor': payouts['Vendor'],
+                      'Store_Standard': payouts['Store_Standard'].astype(str), 'Batch_IDs': payouts['Batch_ID'],
+                      'Expected_Date': payouts['Expected_Date'], 'Payout': payouts['Amount']}),
+        pd.DataFrame({'Match_Type': 'unmatched_deposit', 'Vendor': deposits['Vendor'],
+                      'Deposit_IDs': deposits['Deposit_ID'].astype(str), 'Deposit_Date': deposits['Date'],
+                      'Deposit_Amount': deposits['Amount']}),
+    ]
+    rows = [r for r in rows if len(r)]
+    if not rows:
+        return pd.DataFrame(columns=MATCH_COLUMNS)
+    return pd.concat(rows, ignore_index=True).reindex(columns=MATCH_COLUMNS)
+
+def match_summary(matched):
+    """Counts and dollar amounts per match type (including what is left unmatched on each side)"""
+    table = reconciliation_table(matched)
+    if len(table) == 0:
+        return pd.DataFrame(columns=['Match_Type', 'Rows', 'Payout', 'Deposit_Amount'])
+    return (table.groupby('Match_Type', sort=False)
+            .agg(Rows=('Match_Type', 'size'), Payout=('Payout', 'sum'), Deposit_Amount=('Deposit_Amount', 'sum'))
+            .reset_index())
@@ -0,0 +1,125 @@
+"""Result cache for processed statements, keyed by file content hash"""
+import hashlib
+import os
+import stat
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# 处理逻辑有变动时递增，旧缓存随之失效
+PROCESSOR_VERSION = '4.6'
+
+RESULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+RESULT_CACHE_DISK_MAX_BYTES = 4 * 1024 * 1024 * 1024
+# 磁盘缓存是 pickle，读入即执行其中的对象：默认放在当前用户自己的缓存目录，不放共享的临时目录
+RESULT_CACHE_DIR = os.environ.get('RECON_CACHE_DIR') or os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'luckin_recon')
+
+def private_dir(path):
+    """Create path as a directory only the current user can use (0o700), or check an existing one
+
+    Raises PermissionError for a symlink, a directory owned by another user
+    or one others can write to - pickles in it could have been planted. An
+    own directory that others can merely read is tightened to 0o700.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode):
+        raise PermissionError(f"{path} is not a directory (symlink?)")
+    if hasattr(os, 'getuid') and info.st_uid != os.getuid():
+        raise PermissionError(f"{path} belongs to another user (uid {info.st_uid})")
+    if os.name == 'posix' and info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise PermissionError(f"{path} is writable by other users; fix with chmod 700 or use another directory")
+    if os.name == 'posix' and stat.S_IMODE(info.st_mode) != 0o700:
+        os.chmod(path, 0o700)
+    return path
+
+def content_hash(uploaded_file, block_size=1 << 20):
+    """SHA-256 of the file content, read in blocks"""
+    h = hashlib.sha256()
+    uploaded_file.seek(0)
+    for block in iter(lambda: uploaded_file.read(block_size), b''):
+        h.update(block)
+    uploaded_file.seek(0)
+    return h.hexdigest()
+
+class ResultCache:
+    """LRU cache of processed statements, bounded by memory size, with an optional on-disk tier"""
+
+    def __init__(self, max_bytes=RESULT_CACHE_MAX_BYTES, disk_dir=None,
+                 disk_max_bytes=RESULT_CACHE_DISK_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()  # key -> (DataFrame, nbytes)
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        if disk_dir:
+            private_dir(disk_dir)
+
+    @staticmethod
+    def make_key(processor_name, file_hash, **options):
+        raw = f"{PROCESSOR_VERSION}|{processor_name}|{sorted(options.items())}|{file_hash}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.pkl")
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+        if self.disk_dir and os.path.exists(self._disk_path(key)):
+            try:
+                df = pd.read_pickle(self._disk_path(key))
+            except Exception:
+                return None
+            os.utime(self._disk_path(key))
+            self._remember(key, df)
+            return df
+        return None
+
+    def put(self, key, df):
+        self._remember(key, df)
+        if self.disk_dir:
+            tmp_path = self._disk_path(key) + '.tmp'
+            df.to_pickle(tmp_path)
+            os.replace(tmp_path, self._disk_path(key))
+            self._prune_disk()
+
+    def _remember(self, key, df):
+        nbytes = int(df.memory_usage(deep=True).sum())
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._nbytes -= self._entries.pop(key)[1]
+            self._entries[key] = (df, nbytes)
+            self._nbytes += nbytes
+            while self._nbytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._nbytes -= evicted
+
+    def _prune_disk(self):
+        files = [os.path.join(self.disk_dir, f) for f in os.listdir(self.disk_dir) if f.endswith('.pkl')]
+        files = sorted(files, key=os.path.getmtime)
+        total = sum(os.path.getsize(f) for f in files)
+        for f in files:
+            if total <= self.disk_max_bytes:
+                break
+            total -= os.path.getsize(f)
+            os.remove(f)
+
+def cached_process(cache, processor, uploaded_file, **options):
+    """Run a platform processor through the result cache - byte-identical files are parsed once"""
+    if cache is None:
+        return processor(uploaded_file, **options)
+    key = cache.make_key(processor.__name__, content_hash(uploaded_file), **options)
+    df = cache.get(key)
+    if df is None:
+        df = processor(uploaded_file, **options)
+        if df is not None:
+            cache.put(key, df)
+    return df
@@ -0,0 +1,400 @@
+"""Command-line batch entry point: python -m recon --ubereats ... --doordash ... --grubhub ... (or --watch DIR)"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+import time
+import uuid
+
+from .platforms import PLATFORM_SPECS
+
+# 每个注册平台一个参数：--ubereats、--doordash ...
+PLATFORM_ARGS = [(name, name.lower()) for name in PLATFORM_SPECS]
+
+def expand_paths(patterns):
+    """Expand paths/globs in argument order, dropping duplicates"""
+    paths = []
+    for pattern in patterns or []:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for path in matches:
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m recon',
+        description='Headless fee reconciliation: platform statement CSVs -> Excel report + summary')
+    for platform, arg in PLATFORM_ARGS:
+        parser.add_argument(f'--{arg}', nargs='+', metavar='PATH', default=[],
+                            help=f'{platform} statement paths or globs: CSV, .csv.gz, .xlsx, or zip of those')
+    parser.add_argument('-o', '--output', help='Excel report path (default: <out-dir>/Luckin_Fee_Breakdown_Report_v4.xlsx)')
+    parser.add_argument('--out-dir', default='.', help='directory for outputs (default: current directory)')
+    parser.add_argument('--summary-json', help='also write the summary rows as JSON to this path ("-" for stdout)')
+    parser.add_argument('--no-excel', action='store_true', help='skip the Excel report')
+    parser.add_argument('--archive', choices=['csv', 'parquet'],
+                        help='also write summary, per-store fees and detail rows as a CSV or Parquet zip '
+                             '(much faster than Excel for large months)')
+    parser.add_argument('--exceptions', action='store_true',
+                        help='also write the orders whose Net_Payout differs from the expected net (CSV) and '
+                             'print them grouped by store and reason')
+    parser.add_argument('--tolerance', type=float, default=0.01,
+                        help='dollar difference allowed per order before it counts as an exception (default: 0.01)')
+    parser.add_argument('--bank', nargs='+', metavar='PATH', default=[],
+                        help='bank statements (CSV or OFX/QFX, paths or globs) to match platform payouts against')
+    parser.add_argument('--bank-tolerance', type=float, default=0.01,
+                        help='dollar difference allowed between a payout and its deposit(s) (default: 0.01)')
+    parser.add_argument('--bank-window', type=int, default=5,
+                        help='days a deposit may land before/after the expected payout date (default: 5)')
+    parser.add_argument('--period', default='2025-10',
+                        help='reporting period: 2025-10, 2025-07:2025-09, 2025-10-05:2025-10-20, '
+                             '2025-Q3, QTD[:YYYY-MM-DD], YTD[:YYYY-MM-DD] or "all" (default: 2025-10)')
+    parser.add_argument('--split-months', action='store_true',
+                        help='write one report per month of the period into <out-dir>/<YYYY-MM>/')
+    parser.add_argument('--chunksize', type=int,
+                        help='read statements in chunks of this many rows (per-store totals only; one statement '
+                             'per platform, as overlapping orders cannot be deduplicated)')
+    parser.add_argument('--compact', action='store_true',
+                        help='hold amounts as int64 cents and vendor/store as categoricals (exact totals, '
+                             'several times less memory); dollars appear only in the outputs')
+    parser.add_argument('--mode', default='process', choices=['thread', 'process', 'sequential'],
+                        help='how to run the three platforms (default: process)')
+    parser.add_argument('--cache-dir', help='reuse results for byte-identical statements via this on-disk cache')
+    parser.add_argument('--ledger', metavar='DIR',
+                        help='fold the processed rows into the Parquet ledger in DIR, skipping orders already '
+                             'ingested (needs pyarrow)')
+    parser.add_argument('--ledger-replace', action='store_true',
+                        help='replace the ledger partitions being written instead of ingesting only new/changed rows')
+    parser.add_argument('--from-ledger', action='store_true',
+                        help='build the report for --period from the --ledger instead of statement CSVs')
+    parser.add_argument('--yoy', action='store_true',
+                        help='also print a year-over-year comparison for --period from the --ledger')
+    parser.add_argument('--log-json', metavar='PATH',
+                        help='write per-stage timings (wall time, rows in/out, RSS) as JSON lines ("-" for stderr)')
+    parser.add_argument('--trace-alloc', action='store_true',
+                        help='also record tracemalloc allocation deltas per stage (slower)')
+    parser.add_argument('--watch', metavar='DIR',
+                        help='watch DIR for statements instead: new files are processed as they land (platform '
+                             'and period detected from their headers, read via memory maps) and each touched '
+                             "month's outputs are rewritten in DIR/_recon/<YYYY-MM>/")
+    parser.add_argument('--interval', type=float, default=5.0,
+                        help='seconds between scans of the --watch directory (default: 5)')
+    parser.add_argument('--once', action='store_true',
+                        help='with --watch: process what is in the directory now and exit (backfills)')
+    parser.add_argument('-q', '--quiet', action='store_true', help='do not print the summary table')
+    return parser
+
+def print_summary(rows, file=sys.stdout):
+    header, body = rows[0], rows[1:]
+    print(f"{header[0]:<16}" + ''.join(f"{h:>16}" for h in header[1:]), file=file)
+    for row in body:
+        cells = [f"{v:>16,}" if isinstance(v, int) else f"{v:>16,.2f}" for v in row[1:]]
+        print(f"{row[0]:<16}" + ''.join(cells), file=file)
+
+def write_outputs(results, args, output, summary_json, heading=None, archive=None, exceptions=None):
+    """Print the summary and write the JSON summary / Excel report / detail zip / exception list for one result set"""
+    from .aggregate import aggregate
+    from .diagnostics import stage
+    from .report import summary_rows, write_detail_archive, write_excel_report
+
+    with stage('aggregate'):
+        cube = aggregate(results)
+    rows = summary_rows(cube)
+    if not args.quiet:
+        if heading:
+            print(f"\n== {heading} ==")
+        print_summary(rows)
+    if summary_json:
+        payload = json.dumps({'period': heading, 'columns': rows[0], 'rows': rows[1:]},
+                             ensure_ascii=False, indent=2, default=float)
+        if summary_json == '-':
+            print(payload)
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(summary_json)), exist_ok=True)
+            with open(summary_json, 'w', encoding='utf-8') as f:
+                f.write(payload)
+    if output:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with stage('excel'):
+            write_excel_report(results, output, cube)
+        if not args.quiet:
+            print(f"Excel report: {output}")
+    if archive:
+        os.makedirs(os.path.dirname(os.path.abspath(archive)), exist_ok=True)
+        with stage('archive'):
+            write_detail_archive(results, archive, cube, args.archive)
+        if not args.quiet:
+            print(f"Detail archive: {archive}")
+    if exceptions:
+        from .variance import exception_summary, exceptions_csv, find_exceptions
+        with stage('exceptions'):
+            found = find_exceptions(results, args.tolerance)
+        os.makedirs(os.path.dirname(os.path.abspath(exceptions)), exist_ok=True)
+        with open(exceptions, 'wb') as f:
+            f.write(exceptions_csv(found))
+        if not args.quiet:
+            print(f"Exceptions: {len(found):,} orders off by more than ${args.tolerance:,.2f} -> {exceptions}")
+            if len(found):
+                print(exception_summary(found).to_string(index=False))
+
+def write_bank_match(results, args):
+    """Match the payout batches of the results against the --bank statements and write the reconciliation CSV"""
+    from .bank import BANK_MATCH_FILE_NAME, match_deposits, match_summary, payout_batches, read_bank_statements, \
+        reconciliation_table
+    from .diagnostics import stage
+
+    with stage('bank'):
+        try:
+            deposits = read_bank_statements(expand_paths(args.bank))
+        except ValueError as e:
+            print(f"error: bank statement: {e}", file=sys.stderr)
+            return
+        matched = match_deposits(payout_batches(results), deposits, args.bank_tolerance, args.bank_window)
+    path = os.path.join(args.out_dir, BANK_MATCH_FILE_NAME)
+    os.makedirs(args.out_dir, exist_ok=True)
+    reconciliation_table(matched).to_csv(path, index=False, encoding='utf-8-sig')
+    if not args.quiet:
+        print(f"\n== Bank deposits ({len(deposits):,}) ==")
+        print(match_summary(matched).to_string(index=False))
+        print(f"Bank reconciliation: {path}")
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.trace_alloc:
+        os.environ['RECON_TRACEMALLOC'] = '1'  # 进程池子进程继承环境变量
+
+    if args.watch:
+        # 长时间运行：阶段记录按每轮扫描写日志，不在整个进程里累积
+        return watch_folder(args)
+
+    from .diagnostics import collect, stage
+    with collect('run') as records:
+        with stage('total'):
+            code = run(args)
+    if args.log_json:
+        write_stage_log(records, args, period=args.period, exit_code=code)
+    return code
+
+def write_stage_log(records, args, **context):
+    """Append the --log-json stage rows of one run"""
+    from .diagnostics import summarize, write_json_log
+
+    # 分块读取时每块记一条，日志里按 job x stage 合并
+    rows = summarize(records).to_dict('records')
+    context = {'event': 'stage', 'run_id': uuid.uuid4().hex[:12], 'mode': args.mode, **context}
+    if args.log_json == '-':
+        write_json_log(rows, sys.stderr, **context)
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(args.log_json)), exist_ok=True)
+        with open(args.log_json, 'a', encoding='utf-8') as f:
+            write_json_log(rows, f, **context)
+
+def run(args):
+    """Process the statements (or read the ledger) and write every requested output; returns the exit code"""
+    from .diagnostics import stage
+    from .period import parse_period
+    try:
+        period = None if args.period.lower() == 'all' else parse_period(args.period)
+    except ValueError as e:
+        print(f"error: bad --period {args.period!r}: {e}", file=sys.stderr)
+        return 2
+
+    if (args.from_ledger or args.yoy or args.ledger_replace) and not args.ledger:
+        print("error: --from-ledger/--yoy/--ledger-replace need --ledger DIR", file=sys.stderr)
+        return 2
+    if args.ledger and args.chunksize and not args.from_ledger:
+        print("error: --ledger needs per-order rows; drop --chunksize", file=sys.stderr)
+        return 2
+    if args.bank and args.chunksize and not args.from_ledger:
+        # 分块只有按月的门店汇总，打款批次按结算周汇总，需要逐日明细
+        print("error: --bank needs per-order rows to build weekly payout batches; drop --chunksize", file=sys.stderr)
+        return 2
+    if args.exceptions and args.chunksize and not args.from_ledger:
+        print("error: --exceptions checks each order, which needs per-order rows; drop --chunksize", file=sys.stderr)
+        return 2
+
+    jobs = {platform: expand_paths(getattr(args, arg)) for platform, arg in PLATFORM_ARGS}
+    if args.from_ledger:
+        from .ledger import ledger_results
+        results = ledger_results(args.ledger, period)
+        if args.compact:
+            from .numeric import compact_frame
+            results = {platform: compact_frame(df) for platform, df in results.items()}
+        if all(df is None for df in results.values()):
+            print(f"error: no ledger rows for {period.label if period else 'all'} in {args.ledger}", file=sys.stderr)
+            return 1
+        return write_reports(results, args, period)
+
+    missing = [p for paths in [*jobs.values(), expand_paths(args.bank)] for p in paths if not os.path.isfile(p)]
+    if missing:
+        print(f"error: no such file: {', '.join(missing)}", file=sys.stderr)
+        return 2
+    if not any(jobs.values()):
+        print(f"error: give at least one of {'/'.join(f'--{arg}' for _, arg in PLATFORM_ARGS)}", file=sys.stderr)
+        return 2
+
+    # 重依赖在参数校验之后才导入
+    from .cache import ResultCache
+    from .parallel import run_platforms
+    from .processors import combine_results
+    from .readers import expand_uploads
+
+    try:
+        cache = ResultCache(disk_dir=args.cache_dir) if args.cache_dir else None
+    except PermissionError as e:
+        print(f"error: --cache-dir: {e}", file=sys.stderr)
+        return 2
+    options = {'chunksize': args.chunksize, 'period': period, 'compact': args.compact}
+
+    # 每个平台可有多个文件（zip 包按其中的账单展开）：逐个文件作为一个任务并行处理，再按平台合并
+    tasks, names, failed = {}, {}, False
+    for platform, paths in jobs.items():
+        entries, errors = expand_uploads(paths)
+        for name, error in errors:
+            print(f"error: {platform} {name}: {error}", file=sys.stderr)
+            failed = True
+        if args.chunksize and len(entries) > 1:
+            # 分块只留门店汇总，没有订单指纹，多个文件的重叠订单无法去重
+            print(f"error: --chunksize takes one statement per platform ({platform}: {len(entries)}); "
+                  "drop --chunksize to combine several", file=sys.stderr)
+            return 2
+        for i, (name, source) in enumerate(entries):
+            tasks[(platform, i)], names[(platform, i)] = source, name
+    frames = {platform: {} for platform in jobs}
+    for (platform, i), df, error in run_platforms(tasks, mode=args.mode, cache=cache, **options):
+        if error is not None or df is None:
+            print(f"error: {platform} {names[(platform, i)]}: {error or '文件格式错误'}", file=sys.stderr)
+            failed = True
+        else:
+            frames[platform][i] = df
+
+    results = {}
+    with stage('combine'):
+        for platform, done in frames.items():
+            # 按参数顺序合并；周报/月报重叠的订单只保留一次（后给的文件优先）
+            results[platform] = combine_results([done[i] for i in sorted(done)], compact=args.compact)
+
+    if all(df is None for df in results.values()):
+        print("error: no statement could be processed", file=sys.stderr)
+        return 1
+
+    if args.ledger and args.ledger_replace:
+        from .ledger import append_to_ledger
+        with stage('ledger'):
+            written = append_to_ledger(results, args.ledger, replace=True)
+        if not args.quiet:
+            print(f"Ledger: {written:,} rows -> {args.ledger} (partitions replaced)")
+    elif args.ledger:
+        from .ledger import ingest
+        with stage('ledger'):
+            counts = ingest(results, args.ledger)
+        for platform, c in counts.items():
+            if not args.quiet:
+                print(f"Ledger {platform}: {c['new']:,} new, {c['changed']:,} changed, "
+                      f"{c['unchanged']:,} already ingested -> {args.ledger}")
+
+    return write_reports(results, args, period) or (1 if failed else 0)
+
+def write_reports(results, args, period):
+    """Write the outputs for the processed results (one set, or one per month)"""
+    from .processors import split_results_by_month
+    from .report import DETAIL_ARCHIVE_NAME, REPORT_FILE_NAME
+    from .variance import EXCEPTIONS_FILE_NAME
+
+    def archive_in(directory):
+        return args.archive and os.path.join(directory, DETAIL_ARCHIVE_NAME)
+
+    def exceptions_in(directory):
+        return args.exceptions and os.path.join(directory, EXCEPTIONS_FILE_NAME)
+
+    label = period.label if period else 'all'
+    if args.split_months:
+        # 一次解析，按月拆分出多份报表
+        for month, month_results in split_results_by_month(results).items():
+            month_dir = os.path.join(args.out_dir, month)
+            write_outputs(month_results, args,
+                          None if args.no_excel else os.path.join(month_dir, REPORT_FILE_NAME),
+                          args.summary_json and os.path.join(month_dir, os.path.basename(args.summary_json)),
+                          heading=month, archive=archive_in(month_dir), exceptions=exceptions_in(month_dir))
+    else:
+        write_outputs(results, args,
+                      None if args.no_excel else (args.output or os.path.join(args.out_dir, REPORT_FILE_NAME)),
+                      args.summary_json, heading=label, archive=archive_in(args.out_dir),
+                      exceptions=exceptions_in(args.out_dir))
+
+    if args.bank:
+        write_bank_match(results, args)
+
+    if args.yoy:
+        from .ledger import year_over_year
+        print(f"\n== {label} vs. prior year ==")
+        print(year_over_year(args.ledger, period).to_string(index=False))
+    return 0
+
+def watch_folder(args):
+    """--watch: process statements as they land in the directory and rewrite the outputs of the months they touch"""
+    if not os.path.isdir(args.watch):
+        print(f"error: no such directory: {args.watch}", file=sys.stderr)
+        return 2
+    if args.chunksize:
+        print("error: --watch combines every statement of a month, which needs per-order rows; drop --chunksize",
+              file=sys.stderr)
+        return 2
+    from .diagnostics import collect, stage
+    from .watch import FolderWatcher
+
+    try:
+        watcher = FolderWatcher(args.watch, mode=args.mode, compact=args.compact, cache_dir=args.cache_dir,
+                                settle=not args.once)
+    except PermissionError as e:
+        print(f"error: cache directory: {e}", file=sys.stderr)
+        return 2
+    if not args.quiet and not args.once:
+        print(f"Watching {watcher.directory} every {args.interval:g}s (Ctrl+C to stop)")
+    failed = False
+    try:
+        while True:
+            with collect('watch') as records:
+                with stage('total'):
+                    processed, months = watcher.poll()
+                    failed = not watch_outputs(watcher, processed, months, args) or failed
+            if args.log_json and processed:
+                write_stage_log(records, args, period=','.join(months) or None, watch=watcher.directory)
+            if args.once:
+                return 1 if failed else 0
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        return 0
+
+def watch_outputs(watcher, processed, months, args):
+    """Report the files handled in one --watch poll and rewrite the touched months; False if any file failed"""
+    from .report import DETAIL_ARCHIVE_NAME, REPORT_FILE_NAME
+    from .variance import EXCEPTIONS_FILE_NAME
+
+    ok = True
+    for rel, entry in processed:
+        if entry['error']:
+            print(f"error: {rel}: {entry['error']}", file=sys.stderr)
+            ok = False
+        elif args.quiet:
+            continue
+        elif entry['platform'] is None:
+            print(f"{rel}: skipped, no platform statement header")
+        else:
+            period = ' to '.join(entry['period']) if entry['period'] else 'all dates'
+            print(f"{rel}: {entry['platform']} ({period}), {entry['rows']:,} rows, "
+                  f"months {', '.join(entry['months']) or '-'}")
+    for month, results in watcher.refresh(months):
+        month_dir = os.path.join(watcher.output_dir, month)
+        if all(df is None for df in results.values()):
+            # 该月的账单都已移除
+            shutil.rmtree(month_dir, ignore_errors=True)
+            continue
+        write_outputs(results, args,
+                      None if args.no_excel else os.path.join(month_dir, REPORT_FILE_NAME),
+                      os.path.join(month_dir, 'summary.json'), heading=month,
+                      archive=args.archive and os.path.join(month_dir, DETAIL_ARCHIVE_NAME),
+                      exceptions=args.exceptions and os.path.join(month_dir, EXCEPTIONS_FILE_NAME))
+    return ok
@@ -0,0 +1,138 @@
+"""Stage instrumentation - wall time, rows in/out, RSS and allocation deltas per pipeline stage
+
+Stages record into the innermost collect() block of the current context;
+with nothing collecting, stage() only costs two perf_counter calls. A
+collect() listener sees each record as its stage finishes (live progress).
+Allocation deltas come from tracemalloc, which is slow and therefore only
+switched on when RECON_TRACEMALLOC=1 is set.
+"""
+import contextlib
+import contextvars
+import json
+import os
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_collector = contextvars.ContextVar('recon_stage_collector', default=None)
+
+@dataclass
+class StageRecord:
+    """One timed stage of one job"""
+    stage: str
+    job: str = None
+    seconds: float = 0.0
+    rows_in: int = None
+    rows_out: int = None
+    rss_mb: float = None
+    rss_delta_mb: float = None
+    rss_peak_mb: float = None
+    alloc_delta_mb: float = None
+
+    def as_dict(self):
+        return asdict(self)
+
+def _rss_mb():
+    """Current resident set size (Linux), falling back to the peak where /proc is not available"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except (OSError, ValueError, AttributeError):
+        return _rss_peak_mb()
+
+def _rss_peak_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3  # macOS: bytes, Linux: KB
+
+def _trace_allocations():
+    if os.environ.get('RECON_TRACEMALLOC') == '1' and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    return tracemalloc.is_tracing()
+
+@contextlib.contextmanager
+def collect(job=None, listener=None):
+    """Collect the records of every stage run inside the block; yields the (growing) list
+
+    listener(record), if given, is called as each stage finishes; an exception
+    it raises (e.g. a cancelled job) propagates out of the stage.
+    """
+    records = []
+    token = _collector.set((job, records, listener))
+    try:
+        yield records
+    finally:
+        _collector.reset(token)
+
+def extend(records):
+    """Add records produced elsewhere (a worker thread or process) to the active collector"""
+    active = _collector.get()
+    if active is not None:
+        active[1].extend(records)
+
+@contextlib.contextmanager
+def stage(name, rows_in=None):
+    """Time one stage; set .rows_out on the yielded record once the output size is known"""
+    active = _collector.get()
+    record = StageRecord(name, rows_in=rows_in)
+    if active is None:
+        yield record
+        return
+    record.job = active[0]
+    tracing = _trace_allocations()
+    rss_before = _rss_mb()
+    alloc_before = tracemalloc.get_traced_memory()[0] if tracing else None
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record.seconds = time.perf_counter() - start
+        record.rss_mb = _rss_mb()
+        if record.rss_mb is not None and rss_before is not None:
+            record.rss_delta_mb = record.rss_mb - rss_before
+        record.rss_peak_mb = _rss_peak_mb()
+        if tracing:
+            record.alloc_delta_mb = (tracemalloc.get_traced_memory()[0] - alloc_before) / 1e6
+        active[1].append(record)
+        if active[2] is not None:
+            active[2](record)
+
+def summarize(records):
+    """Records folded per job and stage (chunked reads run each stage once per chunk), in first-seen order"""
+    import pandas as pd
+
+    columns = ['job', 'stage', 'calls', 'seconds', 'rows_in', 'rows_out', 'rss_peak_mb', 'alloc_delta_mb']
+    if not records:
+        return pd.DataFrame(columns=columns)
+    frame = pd.DataFrame([r.as_dict() for r in records])
+    frame['job'] = frame['job'].fillna('')
+    groups = frame.groupby(['job', 'stage'], sort=False)
+    summary = groups.agg(calls=('stage', 'size'), seconds=('seconds', 'sum'),
+                         rows_in=('rows_in', lambda s: s.sum(min_count=1)),
+                         rows_out=('rows_out', lambda s: s.sum(min_count=1)),
+                         rss_peak_mb=('rss_peak_mb', 'max'),
+                         alloc_delta_mb=('alloc_delta_mb', lambda s: s.sum(min_count=1)))
+    summary = summary.reset_index()[columns]
+    summary[['rows_in', 'rows_out']] = summary[['rows_in', 'rows_out']].astype('Int64')
+    return summary
+
+def _json_value(value):
+    # NaN / pd.NA 不是合法 JSON，写成 null；numpy 整数转成 int
+    if value is None or (isinstance(value, float) and value != value) or str(value) == '<NA>':
+        return None
+    return int(value) if hasattr(value, 'dtype') and value.dtype.kind in 'iu' else value
+
+def write_json_log(rows, stream, **context):
+    """One JSON object per row (StageRecord or dict, plus the given context fields) per line"""
+    for row in rows:
+        row = row.as_dict() if isinstance(row, StageRecord) else row
+        line = {key: _json_value(value) for key, value in {**context, **row}.items()}
+        stream.write(json.dumps(line, ensure_ascii=False, default=str) + '\n')
+    stream.flush()
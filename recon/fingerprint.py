@@ -0,0 +1,59 @@
+"""Row fingerprints - stable order identity and content hashes for deduplicating overlapping statements"""
+import pandas as pd
+
+from .platforms import PLATFORM_SPECS
+
+# 各平台订单号列（按优先级，见 platforms.py）；账单没有订单号时按行内容生成指纹
+ORDER_ID_COLUMNS = {name: list(spec.order_id_columns) for name, spec in PLATFORM_SPECS.items()}
+
+# Row_Key: 同一订单在周报/月报里相同；Row_Hash: 订单内容，变了说明平台调整过这笔订单
+FINGERPRINT_COLUMNS = ['Row_Key', 'Row_Hash']
+
+def _hash_frame(frame):
+    # hash_pandas_object 用固定的 hash key，跨进程、跨运行结果一致
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+def add_fingerprints(df, platform, value_columns, id_columns=None):
+    """Add Row_Key (order identity) and Row_Hash (order content) uint64 columns to processed rows
+
+    value_columns are the canonical output columns describing the order;
+    id_columns the order ID columns in priority order (default: ORDER_ID_COLUMNS).
+    Row_Key is the row's content hash - plus the platform order ID when the
+    statement has one - and the occurrence number among rows identical in
+    both. It never depends on where a row sits or which file it came in: an
+    order's sale and its adjustment rows stay separate rows even when they
+    arrive in different statements or in another order, two genuinely
+    identical rows stay two, and the same row in an overlapping export maps
+    to the same key. A platform corrects an order with an adjustment row,
+    so a row whose content differs is a different row.
+    """
+    content = df[[c for c in value_columns if c != 'Vendor']].copy()
+    if 'Date' in content.columns:
+        # 日期按天取值，避免 datetime 精度（ns/us）不同导致哈希不同
+        content['Date'] = content['Date'].dt.strftime('%Y-%m-%d')
+    row_hash = _hash_frame(content)
+
+    occurrence = pd.Series(row_hash, index=df.index).groupby(row_hash).cumcount()
+    row_key = _hash_frame(pd.DataFrame({'hash': row_hash, 'n': occurrence.to_numpy()}))
+
+    if id_columns is None:
+        id_columns = ORDER_ID_COLUMNS.get(platform, [])
+    id_col = next((c for c in id_columns if c in df.columns), None)
+    if id_col is not None:
+        ids = df[id_col].astype(str).str.strip()
+        has_id = (df[id_col].notna() & (ids != '')).to_numpy()
+        # 订单号 + 行内容：同一订单的销售、调整/退款行各自成键，与所在文件和行序无关；
+        # 只有订单号和内容都相同的行才按出现次数编号
+        nth = pd.Series(row_hash, index=df.index).groupby([ids.to_numpy(), row_hash]).cumcount()
+        id_keys = _hash_frame(pd.DataFrame({'vendor': platform, 'id': ids, 'hash': row_hash,
+                                            'n': nth.to_numpy()}))
+        row_key = row_key.copy()
+        row_key[has_id] = id_keys[has_id]
+
+    return df.assign(Row_Key=row_key, Row_Hash=row_hash)
+
+def drop_duplicate_rows(df):
+    """Keep one row per order (the last occurrence, i.e. the later statement) when statements overlap"""
+    if df is None or 'Row_Key' not in df.columns:
+        return df
+    return df.drop_duplicates('Row_Key', keep='last').reset_index(drop=True)
@@ -0,0 +1,262 @@
+"""Background jobs - processing runs off the UI thread, with live progress, cancellation and a queue
+
+JobRunner.submit(work, ...) queues work(job, ...) on a small worker pool (one
+job at a time by default, so runs from several sessions wait their turn) and
+returns the Job at once. The work reports through its Job - stage records via
+job.on_record (rows read -> rows/sec), finished files via job.file_done - and
+stops with JobCancelled at the next stage boundary once job.cancel() is
+called. With a state_dir the runner also keeps <id>.json (status) and <id>.pkl
+(result) on disk, so a finished job can be picked up after a restart.
+
+Finished jobs stay in memory as status only: take_result(job) hands the result
+to its owner - the in-memory copy once, after which the runner drops it, or
+the saved <id>.pkl, which is the only copy kept once a state_dir is set.
+
+Job ids are unguessable tokens (JOB_ID_BYTES random bytes) and a job may
+record its owner: get() hands a job only to the owner it was submitted
+with, so results never leak to another user who learns or guesses an id.
+"""
+import json
+import os
+import pickle
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .cache import private_dir
+
+# 同时运行的任务数；更多的任务排队
+JOB_WORKERS = int(os.environ.get('RECON_JOB_WORKERS', '1'))
+# 内存里保留的已结束任务数（只有状态，结果交给提交者或落盘后即释放），更早的只留在磁盘上
+JOB_HISTORY = 20
+# 任务状态目录：设置 RECON_JOB_DIR 后任务状态和结果落盘，服务重启后仍可取回
+JOB_STATE_DIR = os.environ.get('RECON_JOB_DIR') or None
+
+# 任务 ID 的随机字节数（十六进制为 32 位）：ID 即取结果的凭证，不能被猜到
+JOB_ID_BYTES = 16
+
+FINISHED_STATES = ('done', 'failed', 'cancelled')
+# 计入进度行数的阶段：读取（逐块）和缓存命中
+ROW_STAGES = ('read', 'cache')
+
+class JobCancelled(Exception):
+    """Raised inside a job's work once the job has been cancelled"""
+
+class Job:
+    """State and live progress of one background run"""
+
+    def __init__(self, label='', files_total=0, bytes_total=0, params=None, job_id=None, owner=None):
+        self.id = job_id or secrets.token_hex(JOB_ID_BYTES)
+        self.owner = owner  # 提交者（登录用户），None 为匿名
+        self.label = label
+        self.params = params or {}
+        self.status = 'queued'
+        self.created = time.time()
+        self.started = None
+        self.ended = None
+        self.files_total = files_total
+        self.files_done = 0
+        self.bytes_total = bytes_total
+        self.bytes_done = 0
+        self.rows = 0
+        self.step = ''
+        self.messages = []  # 单个文件的报错等，不影响整批
+        self.error = None
+        self.result = None  # 交给提交者之前的结果；落盘后只留 result_path
+        self.result_path = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATES
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        """Ask the job to stop - a queued job never starts, a running one stops at its next stage"""
+        self._cancel.set()
+
+    def check(self):
+        """Raise JobCancelled if cancel() was called"""
+        if self._cancel.is_set():
+            raise JobCancelled(self.id)
+
+    def on_record(self, record):
+        """diagnostics listener: count rows read, and stop here if the job was cancelled"""
+        if record.stage in ROW_STAGES and record.rows_out:
+            with self._lock:
+                self.rows += record.rows_out
+        self.check()
+
+    def file_done(self, nbytes=0, message=None):
+        with self._lock:
+            self.files_done += 1
+            self.bytes_done += nbytes
+            if message:
+                self.messages.append(message)
+
+    def set_step(self, step):
+        self.step = step
+        self.check()
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.ended or time.time()) - self.started
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def fraction(self):
+        """Share of the input processed, by bytes when sizes are known, else by files"""
+        if self.status == 'done':
+            return 1.0
+        if self.bytes_total:
+            return min(self.bytes_done / self.bytes_total, 1.0)
+        return self.files_done / self.files_total if self.files_total else 0.0
+
+    def snapshot(self):
+        """JSON-safe status (no result)"""
+        return {'id': self.id, 'owner': self.owner, 'label': self.label, 'params': self.params, 'status': self.status,
+                'created': self.created, 'started': self.started, 'ended': self.ended,
+                'files_total': self.files_total, 'files_done': self.files_done,
+                'bytes_total': self.bytes_total, 'bytes_done': self.bytes_done, 'rows': self.rows,
+                'step': self.step, 'messages': list(self.messages), 'error': self.error}
+
+    @classmethod
+    def from_snapshot(cls, state):
+        job = cls(state['label'], state['files_total'], state['bytes_total'], state['params'], state['id'],
+                  state.get('owner'))
+        for key in ('status', 'created', 'started', 'ended', 'files_done', 'bytes_done', 'rows', 'step', 'error'):
+            setattr(job, key, state[key])
+        job.messages = list(state['messages'])
+        return job
+
+class JobRunner:
+    """Queue of background jobs, shared by every session of a server process"""
+
+    def __init__(self, workers=JOB_WORKERS, state_dir=JOB_STATE_DIR, history=JOB_HISTORY):
+        self.workers = max(workers, 1)
+        self.state_dir = state_dir
+        self.history = history
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='recon-job')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        if state_dir:
+            # 结果以 pickle 落盘：目录必须只属于当前用户（否则 PermissionError）
+            private_dir(state_dir)
+
+    def submit(self, work, *args, label='', files_total=0, bytes_total=0, params=None, owner=None, **kwargs):
+        """Queue work(job, *args, **kwargs) on behalf of owner; its return value becomes job.result"""
+        job = Job(label, files_total, bytes_total, params, owner=owner)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._save(job)
+        self._pool.submit(self._run, job, work, args, kwargs)
+        return job
+
+    def _run(self, job, work, args, kwargs):
+        if job.cancel_requested:
+            job.status, job.ended = 'cancelled', time.time()
+            self._save(job)
+            return
+        job.status, job.started = 'running', time.time()
+        self._save(job)
+        try:
+            job.result = work(job, *args, **kwargs)
+        except JobCancelled:
+            job.status = 'cancelled'
+        except Exception as e:
+            job.status, job.error = 'failed', f"{type(e).__name__}: {e}"
+        else:
+            job.status = 'done'
+        job.ended = time.time()
+        self._save(job, with_result=job.status == 'done')
+        if job.result_path is not None:
+            job.result = None  # 结果已在磁盘上，内存里不再留一份
+
+    def take_result(self, job):
+        """The finished job's result for its owner to keep - the in-memory copy is handed over only once
+
+        A result saved under state_dir is read back from disk on every call;
+        None once the result is gone (handed over already, or never saved).
+        """
+        with self._lock:
+            result, job.result = job.result, None
+        if result is None and job.result_path is not None and os.path.exists(job.result_path):
+            with open(job.result_path, 'rb') as f:
+                result = pickle.load(f)
+        return result
+
+    def get(self, job_id, owner=None):
+        """The job with this id submitted by owner - from memory, or its saved state on disk - or None
+
+        A job of another owner (or an owned job asked for anonymously, and vice
+        versa) is reported as missing.
+        """
+        if not job_id:
+            return None
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            job = self._load(job_id)
+        return job if job is not None and job.owner == owner else None
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def queue_position(self, job):
+        """Jobs that run before this queued one (0 = next)"""
+        with self._lock:
+            queued = [j for j in self._jobs.values() if j.status == 'queued' and not j.cancel_requested]
+            running = sum(j.status == 'running' for j in self._jobs.values())
+        ahead = next((i for i, j in enumerate(queued) if j is job), len(queued))
+        return ahead + max(running - (self.workers - 1), 0)
+
+    def _prune(self):
+        # 已结束的旧任务移出内存（磁盘上的状态和结果保留）
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(len(finished) - self.history, 0)]:
+            del self._jobs[job_id]
+
+    def _path(self, job_id, ext):
+        return os.path.join(self.state_dir, f"{job_id}.{ext}")
+
+    def _save(self, job, with_result=False):
+        if not self.state_dir:
+            return
+        if with_result:
+            tmp = self._path(job.id, 'pkl.tmp')
+            with open(tmp, 'wb') as f:
+                pickle.dump(job.result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._path(job.id, 'pkl'))
+            job.result_path = self._path(job.id, 'pkl')
+        tmp = self._path(job.id, 'json.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(job.snapshot(), f, ensure_ascii=False)
+        os.replace(tmp, self._path(job.id, 'json'))
+
+    def _load(self, job_id):
+        if not self.state_dir or not job_id.isalnum() or not os.path.exists(self._path(job_id, 'json')):
+            return None
+        with open(self._path(job_id, 'json'), encoding='utf-8') as f:
+            job = Job.from_snapshot(json.load(f))
+        if not job.finished:
+            # 保存时还在运行/排队，说明运行它的进程已经退出
+            job.status, job.error = 'failed', 'interrupted: the server restarted before the job finished'
+        elif job.status == 'done' and os.path.exists(self._path(job_id, 'pkl')):
+            job.result_path = self._path(job_id, 'pkl')  # 结果在 take_result 时才读
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        return job
@@ -0,0 +1,190 @@
+"""Persistent ledger - processed order rows as Parquet partitioned by vendor / month / store
+
+Needs pyarrow. Each append writes new files under
+<root>/Vendor=<platform>/Month=<YYYY-MM>/Store_Standard=<store>/, so reads
+for a period, vendor or store only open the matching partitions, and the
+remaining filters (e.g. the exact date range) are pushed down to the
+Parquet scan.
+
+ingest() is the incremental path: rows carry fingerprints (see
+recon.fingerprint), orders already in the ledger are skipped, and only the
+partitions holding changed orders are rewritten, so a refresh costs time in
+proportion to the delta rather than the history.
+"""
+import datetime as dt
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from .fingerprint import FINGERPRINT_COLUMNS, drop_duplicate_rows
+from .numeric import to_dollars
+from .period import Period
+from .processors import OUTPUT_COLUMNS
+
+DEFAULT_LEDGER_DIR = os.environ.get('RECON_LEDGER_DIR', 'ledger')
+
+PARTITION_KEYS = ['Vendor', 'Month', 'Store_Standard']
+
+# 台账列：三个平台输出列的并集（某平台没有的列为空值）
+LEDGER_COLUMNS = list(dict.fromkeys(c for cols in OUTPUT_COLUMNS.values() for c in cols))
+MONEY_COLUMNS = [c for c in LEDGER_COLUMNS if c not in ['Vendor', 'Store_Standard', 'Date'] + FINGERPRINT_COLUMNS]
+
+def _arrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+    except ImportError as e:
+        raise ImportError("the ledger needs pyarrow: pip install pyarrow") from e
+    return pa, ds
+
+def _schema():
+    """(file + partition schema, hive partitioning) of the ledger dataset"""
+    pa, ds = _arrow()
+    fields = ([pa.field('Date', pa.timestamp('ns'))] + [pa.field(c, pa.float64()) for c in MONEY_COLUMNS]
+              + [pa.field(c, pa.uint64()) for c in FINGERPRINT_COLUMNS])
+    keys = [pa.field(k, pa.string()) for k in PARTITION_KEYS]
+    return pa.schema(fields + keys), ds.partitioning(pa.schema(keys), flavor='hive')
+
+def _to_ledger_frame(df):
+    if 'Date' not in df.columns:
+        raise ValueError("only per-order rows can go into the ledger (chunked rollups have no Date)")
+    # 台账统一存美元（float64）；紧凑模式的整数分在这里换算
+    out = to_dollars(df).reindex(columns=LEDGER_COLUMNS)
+    out['Month'] = out['Date'].dt.strftime('%Y-%m').fillna('unknown')
+    out['Vendor'] = out['Vendor'].astype(str)
+    out['Store_Standard'] = out['Store_Standard'].astype(str)
+    out[MONEY_COLUMNS] = out[MONEY_COLUMNS].astype('float64')
+    return out
+
+def append_to_ledger(results, root=DEFAULT_LEDGER_DIR, replace=False):
+    """Append processed results ({platform: frame}) to the ledger; returns rows written
+
+    replace=True deletes the vendor/month/store partitions being written
+    first, so re-importing a month refreshes it instead of doubling it.
+    """
+    written = 0
+    for df in results.values():
+        if df is None or len(df) == 0:
+            continue
+        frame = _to_ledger_frame(df)
+        _write_rows(frame, root, replace)
+        written += len(frame)
+    return written
+
+def _write_rows(frame, root, replace=False):
+    pa, ds = _arrow()
+    schema, partitioning = _schema()
+    table = pa.Table.from_pandas(frame[schema.names], schema=schema, preserve_index=False)
+    ds.write_dataset(
+        table, root, format='parquet', partitioning=partitioning,
+        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior='delete_matching' if replace else 'overwrite_or_ignore')
+
+def ingest(results, root=DEFAULT_LEDGER_DIR):
+    """Fold processed results into the ledger, writing only new or changed orders
+
+    Returns {platform: {'new': n, 'changed': n, 'unchanged': n}}. The
+    fingerprint index is the ledger's own Row_Key / Row_Hash columns, read
+    only for the vendor and months the incoming statement touches.
+    """
+    counts = {}
+    for platform, df in results.items():
+        if df is None or len(df) == 0:
+            continue
+        frame = drop_duplicate_rows(_to_ledger_frame(df))
+        months = sorted(frame['Month'].unique())
+        seen = read_ledger(root, vendors=[platform], months=months,
+                           columns=FINGERPRINT_COLUMNS + ['Month', 'Store_Standard'])
+        seen = seen.dropna(subset=['Row_Key']).drop_duplicates('Row_Key', keep='last')
+        # 按位置取旧哈希，避免 uint64 经 NaN 转成 float 丢精度
+        position = pd.Index(seen['Row_Key']).get_indexer(frame['Row_Key'])
+        is_new = position == -1
+        is_changed = np.zeros(len(frame), dtype=bool)
+        is_changed[~is_new] = seen['Row_Hash'].to_numpy()[position[~is_new]] != frame['Row_Hash'].to_numpy()[~is_new]
+
+        changed = frame[is_changed]
+        # 有订单被修改的分区整体重写：旧版本行去掉，换成新版本
+        touched = pd.concat([changed[['Month', 'Store_Standard']],
+                             seen.loc[seen['Row_Key'].isin(changed['Row_Key']), ['Month', 'Store_Standard']]]
+                            ).drop_duplicates()
+        in_touched = frame.set_index(['Month', 'Store_Standard']).index.isin(
+            touched.set_index(['Month', 'Store_Standard']).index)
+        appended = frame[is_new & ~in_touched]
+        if len(appended):
+            _write_rows(appended, root)
+        for (month, store), incoming in frame[(is_new | is_changed) & in_touched].groupby(['Month', 'Store_Standard']):
+            kept = read_ledger(root, vendors=[platform], months=[month], stores=[store])
+            kept = kept[~kept['Row_Key'].isin(incoming['Row_Key'])]
+            _write_rows(pd.concat([kept, incoming], ignore_index=True), root, replace=True)
+        counts[platform] = {'new': int(is_new.sum()), 'changed': int(is_changed.sum()),
+                            'unchanged': int(len(frame) - is_new.sum() - is_changed.sum())}
+    return counts
+
+def _ledger_filter(period=None, vendors=None, stores=None, months=None):
+    _, ds = _arrow()
+    expr = None
+
+    def both(a, b):
+        return b if a is None else a & b
+
+    if period is not None:
+        # Month 分区裁剪 + Date 谓词下推
+        expr = both(expr, ds.field('Month').isin(period.months()))
+        expr = both(expr, (ds.field('Date') >= pd.Timestamp(period.start))
+                    & (ds.field('Date') <= pd.Timestamp(period.end)))
+    if months:
+        expr = both(expr, ds.field('Month').isin(list(months)))
+    if vendors:
+        expr = both(expr, ds.field('Vendor').isin(list(vendors)))
+    if stores:
+        expr = both(expr, ds.field('Store_Standard').isin(list(stores)))
+    return expr
+
+def read_ledger(root=DEFAULT_LEDGER_DIR, period=None, vendors=None, stores=None, columns=None, months=None):
+    """Ledger rows matching the period / vendors / stores as one DataFrame"""
+    _, ds = _arrow()
+    schema, partitioning = _schema()
+    if not os.path.isdir(root):
+        return pd.DataFrame(columns=columns or schema.names)
+    dataset = ds.dataset(root, format='parquet', partitioning=partitioning, schema=schema)
+    table = dataset.to_table(columns=columns, filter=_ledger_filter(period, vendors, stores, months))
+    return table.to_pandas()
+
+def ledger_results(root=DEFAULT_LEDGER_DIR, period=None, stores=None):
+    """Ledger rows in processor output shape ({platform: frame}), ready for the report functions"""
+    rows = read_ledger(root, period, stores=stores)
+    results = {}
+    for platform, cols in OUTPUT_COLUMNS.items():
+        part = rows[rows['Vendor'] == platform]
+        results[platform] = part[cols].reset_index(drop=True) if len(part) else None
+    return results
+
+def ledger_summary(root=DEFAULT_LEDGER_DIR, period=None, by=('Vendor', 'Month'), stores=None):
+    """Order count and money totals grouped by ledger columns (Vendor, Month, Store_Standard, ...)"""
+    by = list(by)
+    rows = read_ledger(root, period, stores=stores, columns=by + ['Date'] + MONEY_COLUMNS)
+    groups = rows.groupby(by, sort=True)
+    summary = groups[MONEY_COLUMNS].sum(min_count=1)
+    summary.insert(0, 'Orders', groups.size())
+    return summary.dropna(axis=1, how='all').reset_index()
+
+def _shift_year(day, years):
+    try:
+        return day.replace(year=day.year + years)
+    except ValueError:  # 2月29日
+        return day.replace(year=day.year + years, day=28)
+
+def year_over_year(root=DEFAULT_LEDGER_DIR, period=None, by=('Vendor',), stores=None):
+    """Totals for the period next to the same period one year earlier, with change columns"""
+    period = period or Period(dt.date(dt.date.today().year, 1, 1), dt.date.today())
+    prior = Period(_shift_year(period.start, -1), _shift_year(period.end, -1))
+    current = ledger_summary(root, period, by, stores).set_index(list(by))
+    previous = ledger_summary(root, prior, by, stores).set_index(list(by))
+    metrics = ['Orders', 'Gross_Sales', 'Net_Payout']
+    out = current.reindex(columns=metrics).join(previous.reindex(columns=metrics), how='outer',
+                                                 lsuffix='', rsuffix='_LY').fillna(0)
+    for m in metrics:
+        out[f'{m}_YoY'] = (out[m] - out[f'{m}_LY']) / out[f'{m}_LY'].where(out[f'{m}_LY'] != 0)
+    return out.reset_index()
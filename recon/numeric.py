@@ -0,0 +1,109 @@
+"""Money parsing - scalar clean_num, its vectorized counterpart and the int64-cents compact form"""
+import numpy as np
+import pandas as pd
+
+from .fingerprint import FINGERPRINT_COLUMNS
+
+# 紧凑模式：金额列存 int64 分（整数求和无浮点误差），平台/门店存 category；
+# 金额列是整数类型即表示单位为分，只在展示和导出时换算回美元
+CENTS_PER_DOLLAR = 100
+CATEGORY_COLUMNS = ['Vendor', 'Store_Standard']
+COUNT_COLUMNS = ['Orders'] + FINGERPRINT_COLUMNS
+
+def clean_num(x):
+    """Convert various number formats to float"""
+    if isinstance(x, (int, float)):
+        return x
+    try:
+        clean = str(x).replace(',', '').replace('$', '').replace(' ', '').strip()
+        # 会计格式负数: (12.50) → -12.50
+        if clean.startswith('(') and clean.endswith(')'):
+            clean = '-' + clean[1:-1]
+        return float(clean) if clean else 0.0
+    except:
+        return 0.0
+
+# 纯数字文本（可直接整列转换为 float 的部分）
+_PLAIN_NUMBER = r'[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?'
+_UNSIGNED_NUMBER = r'(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?'
+
+def clean_num_series(s):
+    """Vectorized clean_num - parse a whole column at once, same results as clean_num"""
+    if pd.api.types.is_bool_dtype(s):
+        return s.apply(clean_num)
+    if pd.api.types.is_numeric_dtype(s):
+        return s.astype('float64')
+
+    text = (s.astype(str)
+            .str.replace(',', '', regex=False)
+            .str.replace('$', '', regex=False)
+            .str.replace(' ', '', regex=False)
+            .str.strip())
+
+    out = pd.Series(np.nan, index=s.index, dtype='float64')
+    plain = text.str.fullmatch(_PLAIN_NUMBER, na=False).astype(bool)
+    if plain.any():
+        out[plain] = text[plain].astype('float64')
+    blank = (text == '').astype(bool)
+    out[blank] = 0.0
+
+    # 会计格式负数: (12.50) → -12.50
+    paren = ~(plain | blank) & text.str.fullmatch(r'\(' + _UNSIGNED_NUMBER + r'\)', na=False).astype(bool)
+    if paren.any():
+        out[paren] = -text[paren].str.slice(1, -1).astype('float64')
+
+    # 空值：clean_num 只让 float NaN 保持 NaN，None / NA / NaT 都按 0 计（openpyxl 的空单元格是 None）
+    missing = s.isna() & ~(plain | blank | paren)
+    if missing.any():
+        none = missing & (s.to_numpy(dtype=object) == None)  # noqa: E711 逐元素比较
+        out[none] = 0.0
+        # float NaN 已是 NaN；只有出现 NA / NaT 等其他空值时才逐个走 clean_num
+        other = missing & ~none
+        if any(not isinstance(v, float) for v in pd.unique(s[other])):
+            out[other] = [clean_num(v) for v in s[other]]
+
+    # 其余（inf、乱码等）按唯一值逐个走 clean_num，保证结果完全一致
+    rest = ~(plain | blank | paren | missing)
+    if rest.any():
+        rest_vals = s[rest]
+        lookup = {v: clean_num(v) for v in pd.unique(rest_vals)}
+        out[rest] = rest_vals.map(lookup).astype('float64')
+    return out
+
+def money_columns(df):
+    """Numeric columns of a result frame that hold amounts (everything but counts and fingerprints)"""
+    return [c for c in df.columns if c not in COUNT_COLUMNS
+            and pd.api.types.is_numeric_dtype(df[c]) and not pd.api.types.is_bool_dtype(df[c])]
+
+def is_cents(values):
+    """Money held as integer cents (compact frames) rather than float dollars"""
+    return pd.api.types.is_integer_dtype(values)
+
+def to_cents(values):
+    """Float dollars -> int64 cents, rounded to the nearest cent (missing amounts count as 0)"""
+    if is_cents(values):
+        return values.astype('int64')
+    return pd.Series(np.rint(values.fillna(0.0).to_numpy(dtype='float64') * CENTS_PER_DOLLAR).astype('int64'),
+                     index=values.index, name=values.name)
+
+def to_dollars(values):
+    """Cents -> float dollars for display and export: a money column, or every money column of a frame
+
+    Float input is already in dollars and comes back unchanged.
+    """
+    if isinstance(values, pd.DataFrame):
+        cents = [c for c in money_columns(values) if is_cents(values[c])]
+        if not cents:
+            return values
+        return values.assign(**{c: values[c] / CENTS_PER_DOLLAR for c in cents})
+    return values / CENTS_PER_DOLLAR if is_cents(values) else values
+
+def compact_frame(df):
+    """Money columns as int64 cents and vendor / store as categoricals - several times smaller than floats and strings"""
+    if df is None:
+        return None
+    out = df.assign(**{c: to_cents(df[c]) for c in money_columns(df)})
+    for col in CATEGORY_COLUMNS:
+        if col in out.columns:
+            out[col] = out[col].astype('category')
+    return out
@@ -0,0 +1,114 @@
+"""Concurrent execution of the platform processors"""
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from .cache import content_hash
+from .diagnostics import collect, extend, stage
+from .processors import PLATFORM_PROCESSORS
+from .readers import MappedFile, ZipMember, open_source
+
+# 'thread' = 线程池并行, 'process' = 进程池并行, 'sequential' = 逐个处理
+EXECUTION_MODES = ('thread', 'process', 'sequential')
+
+def process_source(platform, source, options, job=None, listener=None):
+    """Run one platform processor on a path, bytes or open file (module-level so process pools can pickle it)
+
+    Returns (result, stage records) - the records travel back from worker
+    threads and processes with the result. listener sees each record live
+    (threads only; it cannot cross a process boundary).
+    """
+    with collect(job or platform, listener) as records, open_source(source) as f:
+        return PLATFORM_PROCESSORS[platform](f, **options), records
+
+def _picklable(source):
+    if isinstance(source, (str, bytes, MappedFile, ZipMember)) or hasattr(source, '__fspath__'):
+        return source
+    source.seek(0)
+    return source.read()
+
+def _platform_of(job):
+    return job[0] if isinstance(job, tuple) else job
+
+def _job_label(job):
+    return '#'.join(map(str, job)) if isinstance(job, tuple) else str(job)
+
+def run_platforms(jobs, mode='thread', max_workers=None, cache=None, listener=None, **options):
+    """Run platform processors, yielding (job, result, error) as each one finishes
+
+    jobs maps a platform name - or a (platform, label) tuple when a platform
+    has several files - to a path, bytes or open binary file. Stage records
+    of every job go to the caller's active diagnostics.collect() block, and
+    to listener(record) as they happen (process-pool records arrive with
+    their result). Closing the generator early cancels the jobs that have
+    not started yet.
+    """
+    if mode not in EXECUTION_MODES:
+        raise ValueError(f"unknown execution mode: {mode}")
+
+    # 先查缓存，命中的任务直接返回
+    pending, keys = {}, {}
+    for job, source in jobs.items():
+        if cache is not None:
+            with collect(_job_label(job), listener) as records:
+                try:
+                    with stage('cache') as record, open_source(source) as f:
+                        name = PLATFORM_PROCESSORS[_platform_of(job)].__name__
+                        keys[job] = cache.make_key(name, content_hash(f), **options)
+                        df = cache.get(keys[job])
+                        record.rows_out = None if df is None else len(df)
+                except Exception as e:
+                    df, error = None, e
+                else:
+                    error = None
+            extend(records)
+            if error is not None:
+                yield job, None, error
+                continue
+            if df is not None:
+                yield job, df, None
+                continue
+        pending[job] = source
+
+    replay = False
+
+    def finish(job, outcome):
+        df, records = outcome
+        extend(records)
+        if replay and listener is not None:
+            # 进程池的记录随结果一起回来，到这里才交给 listener
+            for record in records:
+                listener(record)
+        if cache is not None and df is not None:
+            cache.put(keys[job], df)
+        return job, df, None
+
+    if mode == 'sequential' or len(pending) <= 1:
+        for job, source in pending.items():
+            try:
+                yield finish(job, process_source(_platform_of(job), source, options, _job_label(job), listener))
+            except Exception as e:
+                yield job, None, e
+        return
+
+    if mode == 'process':
+        executor = ProcessPoolExecutor(max_workers=max_workers or min(len(pending), os.cpu_count() or 1))
+        pending = {job: _picklable(source) for job, source in pending.items()}
+        replay = True
+    else:
+        # 每平台几十个周报文件时线程数封顶，避免同时解析的帧过多
+        executor = ThreadPoolExecutor(max_workers=max_workers or min(len(pending), (os.cpu_count() or 1) + 4))
+    with executor as pool:
+        futures = {pool.submit(process_source, _platform_of(job), source, options, _job_label(job),
+                               None if replay else listener): job
+                   for job, source in pending.items()}
+        try:
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    yield finish(job, future.result())
+                except Exception as e:
+                    yield job, None, e
+        except GeneratorExit:
+            # 调用方提前停止（如任务被取消）：未开始的文件不再处理
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
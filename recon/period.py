@@ -0,0 +1,107 @@
+"""Reporting periods - month, multi-month, quarter, QTD/YTD and custom date ranges"""
+import calendar
+import datetime as dt
+import re
+from dataclasses import dataclass
+
+@dataclass(frozen=True)
+class Period:
+    """Inclusive date range of a report"""
+    start: dt.date
+    end: dt.date
+
+    def __post_init__(self):
+        if self.start > self.end:
+            raise ValueError(f"period start {self.start} is after end {self.end}")
+
+    @property
+    def label(self):
+        first, last = self.start.strftime('%Y-%m'), self.end.strftime('%Y-%m')
+        if self.start.day == 1 and self.end == month_end(self.end.year, self.end.month):
+            return first if first == last else f"{first}~{last}"
+        return f"{self.start.isoformat()}~{self.end.isoformat()}"
+
+    def months(self):
+        """YYYY-MM labels of every month the period touches"""
+        labels, (y, m) = [], (self.start.year, self.start.month)
+        while (y, m) <= (self.end.year, self.end.month):
+            labels.append(f"{y:04d}-{m:02d}")
+            y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+        return labels
+
+    def mask(self, dates):
+        """Boolean mask of a datetime Series falling inside the period (NaT is outside)"""
+        import pandas as pd
+        return dates.between(pd.Timestamp(self.start), pd.Timestamp(self.end))
+
+def month_end(year, month):
+    return dt.date(year, month, calendar.monthrange(year, month)[1])
+
+def month_period(year, month):
+    return Period(dt.date(year, month, 1), month_end(year, month))
+
+def quarter_period(year, quarter):
+    first = 3 * (quarter - 1) + 1
+    return Period(dt.date(year, first, 1), month_end(year, first + 2))
+
+def quarter_to_date(as_of=None):
+    as_of = as_of or dt.date.today()
+    first = 3 * ((as_of.month - 1) // 3) + 1
+    return Period(dt.date(as_of.year, first, 1), as_of)
+
+def year_to_date(as_of=None):
+    as_of = as_of or dt.date.today()
+    return Period(dt.date(as_of.year, 1, 1), as_of)
+
+# 默认账期：2025年10月（与原先写死的过滤一致）
+DEFAULT_PERIOD = month_period(2025, 10)
+
+def _parse_bound(text, is_end):
+    text = text.strip()
+    if re.fullmatch(r'\d{4}-\d{2}', text):
+        year, month = map(int, text.split('-'))
+        return month_end(year, month) if is_end else dt.date(year, month, 1)
+    return dt.date.fromisoformat(text)
+
+def parse_period(spec, today=None):
+    """Parse a period spec
+
+    2025-10                      one month
+    2025-07:2025-09              month range (multi-month)
+    2025-10-05:2025-10-20        custom date range
+    2025-Q3                      whole quarter
+    QTD / QTD:2025-11-15         quarter to date (today or the given day)
+    YTD / YTD:2025-11-15         year to date
+    """
+    spec = spec.strip()
+    upper = spec.upper()
+    for prefix, build in (('QTD', quarter_to_date), ('YTD', year_to_date)):
+        if upper == prefix or upper.startswith(prefix + ':'):
+            as_of = dt.date.fromisoformat(spec.split(':', 1)[1]) if ':' in spec else (today or dt.date.today())
+            return build(as_of)
+    match = re.fullmatch(r'(\d{4})-?Q([1-4])', upper)
+    if match:
+        return quarter_period(int(match.group(1)), int(match.group(2)))
+    if ':' in spec:
+        start, end = spec.split(':', 1)
+        return Period(_parse_bound(start, False), _parse_bound(end, True))
+    return Period(_parse_bound(spec, False), _parse_bound(spec, True))
+
+# 账单表头上方的期间说明，如“报表期间: 2025-10-01 至 2025-10-31”“Date range: 10/01/2025 - 10/31/2025”
+_DATE_TEXT = r'(\d{4}[-/.]\d{1,2}[-/.]\d{1,2}|\d{1,2}/\d{1,2}/\d{4})'
+STATEMENT_RANGE_PATTERN = re.compile(_DATE_TEXT + r'\s*(?:至|到|~|-|–|—|to|through)\s*' + _DATE_TEXT, re.IGNORECASE)
+
+def _parse_date_text(text):
+    parts = [int(p) for p in re.split(r'[-/.]', text)]
+    return dt.date(parts[0], parts[1], parts[2]) if parts[0] > 31 else dt.date(parts[2], parts[0], parts[1])
+
+def period_from_text(lines):
+    """The statement period stated in the lines above a statement's header, or None"""
+    for line in lines:
+        match = STATEMENT_RANGE_PATTERN.search(line)
+        if match:
+            try:
+                return Period(_parse_date_text(match.group(1)), _parse_date_text(match.group(2)))
+            except ValueError:
+                continue
+    return None
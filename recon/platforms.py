@@ -0,0 +1,196 @@
+"""Platform statement specs - everything platform-specific about a statement, declared as data
+
+A spec names the header columns, the date and store columns, which statement
+column feeds each canonical amount (and whether its sign is dropped), the
+totals derived from those amounts, the report metrics, the summary cards and
+the expected net. processors.compile_processor turns a spec into the
+processing pipeline, and the CLI flags (--<name lower-cased>), app uploaders
+and report columns follow PLATFORM_SPECS, so a new platform (Toast, Square,
+ezCater...) is one PlatformSpec there plus its store keyword rules in
+data/store_keywords.csv - as long as its metrics are among METRICS. A new
+metric also needs its line in report.SUMMARY_LINES and STORE_REPORT_COLUMNS.
+
+Imports nothing heavy, so the CLI can build its parser from the registry.
+"""
+from dataclasses import dataclass, field
+
+# 金额取值规则：raw 保留账单原值；abs 取绝对值（费用在账单里是负数，统一转成正数）
+SIGN_RULES = ('raw', 'abs')
+
+# 跨平台统一口径的报表指标（aggregate 的 cube 列）；平台声明的指标必须在此列表中
+METRICS = ['Gross_Sales', 'Tax_Collected', 'Discount', 'Commission', 'Marketing', 'Processing',
+           'Credit', 'Order_Error', 'Net_Payout']
+
+@dataclass(frozen=True)
+class PlatformSpec:
+    """Declarative description of one platform's statement and its canonical columns"""
+    name: str
+    store_rule: str  # store_keywords.csv 的 platform 列
+    target_columns: list  # 识别表头行用的列
+    date_column: str
+    store_columns: list  # 多列时以空格拼接后识别门店
+    amounts: dict  # 规范列 -> (账单列, 'raw' | 'abs')
+    value_columns: list  # 明细输出列，按此顺序计算 Row_Hash
+    metrics: dict  # 报表指标 -> 规范列（aggregate）
+    expected_net: dict  # 规范列 -> ±1，按明细推算的净入账（variance）
+    cards: dict  # 网页版汇总卡片：标签 -> 指标（订单数、销售额、税费之后，按声明顺序）
+    derived: dict = field(default_factory=dict)  # 规范列 -> {规范列: ±1}，按声明顺序求和
+    audit_columns: list = field(default_factory=list)  # 差异检查用，不参与行指纹
+    order_id_columns: list = field(default_factory=list)
+    fuzzy: bool = False  # 账单列名带后缀，按包含关系匹配（取表头里第一个包含它的列）
+    date_format: str = None  # 日期格式，None 为月/日/年（STATEMENT_DATE_FORMAT）
+    payout_schedule: str = 'W-SUN'  # 打款周期（结算周截止日，pandas 周期写法）
+    payout_lag_days: int = 0  # 结算周截止后几天到账
+    deposit_pattern: str = None  # 识别该平台银行入账的正则（与转成大写的流水摘要匹配）
+
+    def __post_init__(self):
+        known = set(self.amounts)
+        for name, terms in self.derived.items():
+            unknown = set(terms) - known
+            if unknown:
+                raise ValueError(f"{self.name}: {name} is derived from undeclared column(s) {sorted(unknown)}")
+            known.add(name)
+        bad_rules = {rule for _, rule in self.amounts.values()} - set(SIGN_RULES)
+        if bad_rules:
+            raise ValueError(f"{self.name}: unknown sign rule(s) {sorted(bad_rules)}")
+        outputs = set(self.value_columns) | set(self.audit_columns)
+        missing = ((outputs - known - {'Vendor', 'Store_Standard', 'Date'}) | (set(self.expected_net) - outputs)
+                   | (set(self.metrics.values()) - outputs))
+        if missing:
+            raise ValueError(f"{self.name}: undeclared output column(s) {sorted(missing)}")
+        # 不在 METRICS 里的指标会在汇总时被静默丢掉
+        unknown = (set(self.metrics) | set(self.cards.values())) - set(METRICS)
+        if unknown:
+            raise ValueError(f"{self.name}: unknown metric(s) {sorted(unknown)}; report metrics are {METRICS}")
+        undeclared = set(self.cards.values()) - set(self.metrics)
+        if undeclared:
+            raise ValueError(f"{self.name}: summary card(s) for undeclared metric(s) {sorted(undeclared)}")
+
+    @property
+    def output_columns(self):
+        return list(self.value_columns) + list(self.audit_columns)
+
+    @property
+    def read_options(self):
+        """Keyword arguments for read_statement: header targets, projected columns, text columns"""
+        sources = [col for col, _ in self.amounts.values()]
+        text = [self.date_column] + list(self.store_columns) + list(self.order_id_columns)
+        if self.fuzzy:
+            return dict(target_columns=list(self.target_columns), columns=text,
+                        fuzzy_columns=sources, text_columns=text)
+        return dict(target_columns=list(self.target_columns),
+                    columns=list(dict.fromkeys([self.date_column] + list(self.store_columns) + sources
+                                               + list(self.order_id_columns))),
+                    text_columns=text)
+
+# 明细前三列：平台、门店、日期
+KEY_COLUMNS = ['Vendor', 'Store_Standard', 'Date']
+
+UBEREATS = PlatformSpec(
+    name='UberEats',
+    store_rule='uber',
+    target_columns=['餐厅名称', '销售额（不含税费）', '平台服务费'],
+    date_column='订单日期',
+    store_columns=['餐厅名称'],
+    amounts={
+        'Gross_Sales': ('销售额（不含税费）', 'raw'),
+        'Tax_Collected': ('销售额税费', 'raw'),
+        'Discount': ('商品优惠（含税）', 'abs'),  # 折扣支出
+        'Commission': ('平台服务费', 'abs'),  # 平台佣金
+        'Order_Error': ('订单错误调整额', 'abs'),
+        'Marketing_Credit': ('营销调整额', 'raw'),  # Uber给的营销补贴
+        'Net_Payout': ('收入总额', 'raw'),
+    },
+    # 重新计算的净入账，便于与账单“收入总额”对照
+    derived={'Calculated_Net': {'Gross_Sales': 1, 'Tax_Collected': 1, 'Discount': -1, 'Commission': -1,
+                                'Order_Error': -1, 'Marketing_Credit': 1}},
+    value_columns=KEY_COLUMNS + ['Gross_Sales', 'Tax_Collected', 'Discount', 'Commission', 'Marketing_Credit',
+                                 'Order_Error', 'Calculated_Net', 'Net_Payout'],
+    metrics={'Gross_Sales': 'Gross_Sales', 'Tax_Collected': 'Tax_Collected', 'Discount': 'Discount',
+             'Commission': 'Commission', 'Credit': 'Marketing_Credit', 'Order_Error': 'Order_Error',
+             'Net_Payout': 'Net_Payout'},
+    expected_net={'Gross_Sales': 1, 'Tax_Collected': 1, 'Discount': -1, 'Commission': -1,
+                  'Order_Error': -1, 'Marketing_Credit': 1},
+    cards={'💸 折扣支出': 'Discount', '💸 平台佣金': 'Commission', '💰 营销补贴 (收入)': 'Credit',
+           '💸 订单错误': 'Order_Error', '净入账': 'Net_Payout'},
+    order_id_columns=['订单号', '订单编号', 'Order ID'],
+    payout_lag_days=2,
+    deposit_pattern=r'UBER',
+)
+
+DOORDASH = PlatformSpec(
+    name='DoorDash',
+    store_rule='doordash',
+    target_columns=['店铺名称', '小计', '佣金'],
+    date_column='时间戳本地日期',
+    store_columns=['店铺名称'],
+    fuzzy=True,
+    amounts={
+        'Gross_Sales': ('小计', 'raw'),
+        'Tax_Collected': ('税款小计', 'raw'),
+        'Discount': ('由您出资', 'abs'),  # 商家承担的折扣
+        'Commission': ('佣金', 'abs'),
+        'Marketing_Fee': ('营销费', 'abs'),
+        'Order_Error': ('错误费用', 'abs'),
+        'Marketing_Credit': ('营销积分', 'raw'),  # DoorDash给的积分
+        'DD_Funded': ('由 DoorDash 出资', 'abs'),  # DD承担的折扣（对商家是好事）
+        'Net_Payout': ('净总计', 'raw'),
+    },
+    derived={
+        'Total_Discount': {'Discount': 1},
+        'Total_Commission': {'Commission': 1},
+        'Total_Marketing': {'Marketing_Fee': 1},
+        'Total_Credit': {'Marketing_Credit': 1, 'DD_Funded': 1},
+    },
+    value_columns=KEY_COLUMNS + ['Gross_Sales', 'Tax_Collected', 'Total_Discount', 'Total_Commission',
+                                 'Total_Marketing', 'Total_Credit', 'Order_Error', 'Net_Payout'],
+    audit_columns=['Marketing_Credit'],
+    metrics={'Gross_Sales': 'Gross_Sales', 'Tax_Collected': 'Tax_Collected', 'Discount': 'Total_Discount',
+             'Commission': 'Total_Commission', 'Marketing': 'Total_Marketing', 'Credit': 'Total_Credit',
+             'Order_Error': 'Order_Error', 'Net_Payout': 'Net_Payout'},
+    # DoorDash 出资的折扣不进商家入账，只加营销积分
+    expected_net={'Gross_Sales': 1, 'Tax_Collected': 1, 'Total_Discount': -1, 'Total_Commission': -1,
+                  'Total_Marketing': -1, 'Order_Error': -1, 'Marketing_Credit': 1},
+    cards={'💸 折扣支出 (商家)': 'Discount', '💸 平台佣金': 'Commission', '💸 营销费': 'Marketing',
+           '💰 平台补贴 (收入)': 'Credit', '净入账': 'Net_Payout'},
+    order_id_columns=['DoorDash 订单 ID', '订单 ID', 'Order ID'],
+    payout_lag_days=3,
+    deposit_pattern=r'DOOR\s*DASH',
+)
+
+GRUBHUB = PlatformSpec(
+    name='Grubhub',
+    store_rule='grubhub',
+    target_columns=['store_name', 'subtotal', 'commission'],
+    date_column='transaction_date',
+    store_columns=['store_name', 'street_address'],  # 同名门店靠地址区分
+    amounts={
+        'Gross_Sales': ('subtotal', 'raw'),
+        'Tax_Collected': ('subtotal_sales_tax', 'raw'),
+        'Commission': ('commission', 'abs'),
+        'Delivery_Commission': ('delivery_commission', 'abs'),
+        'Processing_Fee': ('processing_fee', 'abs'),
+        'Merchant_Promo': ('merchant_funded_promotion', 'abs'),
+        'Merchant_Loyalty': ('merchant_funded_loyalty', 'abs'),
+        'Net_Payout': ('merchant_net_total', 'raw'),
+    },
+    derived={
+        'Total_Discount': {'Merchant_Promo': 1, 'Merchant_Loyalty': 1},
+        'Total_Commission': {'Commission': 1, 'Delivery_Commission': 1},
+        'Total_Processing': {'Processing_Fee': 1},
+    },
+    value_columns=KEY_COLUMNS + ['Gross_Sales', 'Tax_Collected', 'Total_Discount', 'Total_Commission',
+                                 'Total_Processing', 'Net_Payout'],
+    metrics={'Gross_Sales': 'Gross_Sales', 'Tax_Collected': 'Tax_Collected', 'Discount': 'Total_Discount',
+             'Commission': 'Total_Commission', 'Processing': 'Total_Processing', 'Net_Payout': 'Net_Payout'},
+    expected_net={'Gross_Sales': 1, 'Tax_Collected': 1, 'Total_Discount': -1, 'Total_Commission': -1,
+                  'Total_Processing': -1},
+    cards={'💸 折扣支出': 'Discount', '💸 佣金合计': 'Commission', '💸 处理费': 'Processing',
+           '净入账': 'Net_Payout'},
+    order_id_columns=['order_number', 'order_id'],
+    payout_lag_days=2,
+    deposit_pattern=r'GRUB\s*HUB',
+)
+
+# 平台注册表：顺序即报表、命令行参数、网页上传框的平台顺序
+PLATFORM_SPECS = {spec.name: spec for spec in [UBEREATS, DOORDASH, GRUBHUB]}
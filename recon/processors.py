@@ -0,0 +1,202 @@
+"""Platform processors - statement CSV to canonical per-order rows"""
+import contextlib
+
+import pandas as pd
+
+from .diagnostics import stage
+from .fingerprint import FINGERPRINT_COLUMNS, add_fingerprints, drop_duplicate_rows
+from .numeric import clean_num_series, compact_frame, is_cents
+from .period import DEFAULT_PERIOD
+from .platforms import PLATFORM_SPECS
+from .readers import read_statement
+from .stores import map_store_ids
+
+ROLLUP_KEYS = ['Vendor', 'Store_Standard', 'Month']
+
+STATEMENT_DATE_FORMAT = '%m/%d/%Y'
+
+def rollup_chunks(frames):
+    """Fold per-chunk order rows into running per-store totals, so peak memory stays at one chunk"""
+    total, ints = None, []
+    for df in frames:
+        df = df.assign(Month=df['Date'].dt.strftime('%Y-%m')).drop(columns=['Date'] + FINGERPRINT_COLUMNS, errors='ignore')
+        # 各块的 category 取值不同，分组键转回普通值再跨块对齐
+        df = df.astype({key: object for key in ROLLUP_KEYS if isinstance(df[key].dtype, pd.CategoricalDtype)})
+        groups = df.groupby(ROLLUP_KEYS, sort=False, dropna=False)
+        part = groups.sum(numeric_only=True)
+        part['Orders'] = groups.size()
+        ints = [c for c in part.columns if is_cents(part[c])]
+        total = part if total is None else total.add(part, fill_value=0)
+    if total is None:
+        return None
+    # add() 对齐时整数列会变成 float：订单数和整数分金额转回 int64（值本身仍是精确整数）
+    total[ints] = total[ints].astype('int64')
+    total = total.reset_index()
+    return total[ROLLUP_KEYS + ['Orders'] + [c for c in total.columns if c not in ROLLUP_KEYS + ['Orders']]]
+
+def merge_rollups(frames):
+    """Sum per-store rollups into one - no order-level dedup, so only for statements known not to overlap"""
+    return (pd.concat(frames, ignore_index=True)
+            .groupby(ROLLUP_KEYS, sort=False, dropna=False, observed=True, as_index=False).sum(numeric_only=True))
+
+def combine_results(parts, compact=False):
+    """One platform frame from its per-file results, in file order - a single concat, overlapping orders kept once
+
+    Detail frames are concatenated once and deduplicated by fingerprint (the
+    later file wins). Chunked per-store rollups carry no fingerprints, so
+    overlapping orders could not be dropped: more than one raises ValueError.
+    """
+    parts = [df for df in parts if df is not None]
+    if not parts:
+        return None
+    if len(parts) == 1:
+        return parts[0]
+    if any('Date' not in df.columns for df in parts):
+        raise ValueError("chunked per-store totals of several statements cannot be deduplicated; "
+                         "read one statement per platform in chunks, or read them without chunks")
+    merged = drop_duplicate_rows(pd.concat(parts, ignore_index=True))
+    # 各文件的 category 取值不同，合并后变回普通列，重新压缩
+    return compact_frame(merged) if compact else merged
+
+def split_by_month(df):
+    """Split a detail frame or rollup into {YYYY-MM: frame} in one pass (rows without a date are dropped)"""
+    months = df['Month'] if 'Month' in df.columns else df['Date'].dt.strftime('%Y-%m')
+    return {month: part for month, part in df.groupby(months, sort=True, observed=True)}
+
+def split_results_by_month(results):
+    """{platform: frame} -> {YYYY-MM: {platform: frame or None}} for per-month reports"""
+    by_month = {}
+    for platform, df in results.items():
+        if df is None:
+            continue
+        for month, part in split_by_month(df).items():
+            by_month.setdefault(month, dict.fromkeys(results))[platform] = part
+    return dict(sorted(by_month.items()))
+
+def filter_period(df, date_col, period, date_format=STATEMENT_DATE_FORMAT):
+    """Parse the statement date and drop out-of-period rows before any per-column derivation"""
+    with stage('filter', rows_in=len(df)) as record:
+        if date_col not in df.columns:
+            df = df.assign(Date=pd.NaT)
+        else:
+            dates = pd.to_datetime(df[date_col], format=date_format, errors='coerce')
+            if period is None:
+                df = df.assign(Date=dates)
+            else:
+                keep = period.mask(dates)
+                df = df.loc[keep].assign(Date=dates[keep])
+        record.rows_out = len(df)
+    return df
+
+def _read(uploaded_file, platform, chunksize):
+    """read_statement under the 'read' stage - chunk iterators are timed chunk by chunk"""
+    with stage('read') as record:
+        data = read_statement(uploaded_file, chunksize=chunksize, **READ_OPTIONS[platform])
+        if isinstance(data, pd.DataFrame):
+            record.rows_out = len(data)
+    return _timed_chunks(data) if chunksize and data is not None else data
+
+@contextlib.contextmanager
+def _timed_chunks(reader):
+    def chunks():
+        while True:
+            with stage('read') as record:
+                chunk = next(reader, None)
+                record.rows_out = 0 if chunk is None else len(chunk)
+            if chunk is None:
+                return
+            yield chunk
+    with reader:
+        yield chunks()
+
+def _compact(df, compact):
+    """int64 cents + categorical vendor/store (compact=True), applied to each chunk before the rollup sums"""
+    if not compact:
+        return df
+    with stage('compact', rows_in=len(df)):
+        return compact_frame(df)
+
+def order_count(df):
+    """Number of orders - detail frames count rows, rolled-up frames carry an Orders column"""
+    return int(df['Orders'].sum()) if 'Orders' in df.columns else len(df)
+
+# ==========================================
+# 🟦 平台数据处理 - 按 platforms.py 的声明编译（费用转正数）
+# ==========================================
+
+# 各平台读取参数、明细输出列（末尾附行指纹，去重用，不进报表）都由平台声明生成
+READ_OPTIONS = {name: spec.read_options for name, spec in PLATFORM_SPECS.items()}
+VALUE_COLUMNS = {name: list(spec.value_columns) for name, spec in PLATFORM_SPECS.items()}
+# 对账差异检查额外需要的明细列（不参与行指纹，加列不会让台账里的旧订单变成“已修改”）
+AUDIT_COLUMNS = {name: list(spec.audit_columns) for name, spec in PLATFORM_SPECS.items()}
+OUTPUT_COLUMNS = {name: spec.output_columns + FINGERPRINT_COLUMNS for name, spec in PLATFORM_SPECS.items()}
+
+def _source_column(df, column, fuzzy):
+    """Statement column for a declared source - exact name, or the first header containing it"""
+    if not fuzzy:
+        return column if column in df.columns else None
+    return next((c for c in df.columns if column in c), None)
+
+def _store_text(df, columns):
+    # 单列原样识别；多列（如 Grubhub 店名 + 地址）以空格拼接
+    if len(columns) == 1:
+        return df[columns[0]]
+    text = df[columns[0]].astype(str)
+    for col in columns[1:]:
+        text = text + " " + df.get(col, pd.Series('', index=df.index)).astype(str)
+    return text
+
+def platform_rows(spec, df, period=DEFAULT_PERIOD):
+    """Canonical order rows for one statement frame (or chunk) as declared by the platform spec"""
+    df.columns = df.columns.str.strip()
+
+    # 账期过滤最先做：期外的行不再参与后续任何解析
+    df = filter_period(df, spec.date_column, period, spec.date_format or STATEMENT_DATE_FORMAT)
+
+    with stage('clean', rows_in=len(df)):
+        # 账单列 -> 规范金额列（缺列记 0，abs 规则把费用转成正数）
+        values = {}
+        for name, (source, rule) in spec.amounts.items():
+            col = _source_column(df, source, spec.fuzzy)
+            series = clean_num_series(df[col]) if col is not None else pd.Series(0.0, index=df.index)
+            values[name] = series.abs() if rule == 'abs' else series
+        # 合并列：按声明顺序逐项加减
+        for name, terms in spec.derived.items():
+            (first, sign), *rest = terms.items()
+            total = values[first] if sign > 0 else -values[first]
+            for term, sign in rest:
+                total = total + values[term] if sign > 0 else total - values[term]
+            values[name] = total
+
+    with stage('stores', rows_in=len(df)):
+        stores = map_store_ids(_store_text(df, spec.store_columns), spec.store_rule)
+
+    # 只组装输出列（和订单号列），中间列不落进明细
+    ids = {col: df[col] for col in spec.order_id_columns if col in df.columns}
+    rows = pd.DataFrame({'Vendor': spec.name, 'Store_Standard': stores, 'Date': df['Date'], **values, **ids},
+                        index=df.index)
+    with stage('fingerprint', rows_in=len(rows)):
+        rows = add_fingerprints(rows, spec.name, spec.value_columns, spec.order_id_columns)
+    return rows[OUTPUT_COLUMNS[spec.name]]
+
+def compile_processor(spec):
+    """process_<platform>(uploaded_file, chunksize=None, period=..., compact=False) for a platform spec"""
+    def process(uploaded_file, chunksize=None, period=DEFAULT_PERIOD, compact=False):
+        data = _read(uploaded_file, spec.name, chunksize)
+        if data is None:
+            return None
+        if chunksize:
+            with data as chunks:
+                return rollup_chunks(_compact(platform_rows(spec, chunk, period), compact) for chunk in chunks)
+        return _compact(platform_rows(spec, data, period), compact)
+
+    # 结果缓存按函数名区分处理器
+    process.__name__ = process.__qualname__ = f'process_{spec.name.lower()}'
+    process.__doc__ = f"Process {spec.name} statement - per-order rows, or per-store totals when read in chunks"
+    return process
+
+PLATFORM_PROCESSORS = {name: compile_processor(spec) for name, spec in PLATFORM_SPECS.items()}
+
+process_ubereats = PLATFORM_PROCESSORS['UberEats']
+process_doordash = PLATFORM_PROCESSORS['DoorDash']
+process_grubhub = PLATFORM_PROCESSORS['Grubhub']
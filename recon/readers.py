@@ -0,0 +1,379 @@
+"""Statement reading - header and encoding sniffing, (chunked) CSV / gzip / xlsx ingestion, multi-file and zip uploads"""
+import codecs
+import contextlib
+import csv
+import datetime as dt
+import gzip
+import importlib.util
+import io
+import mmap
+import os
+import zipfile
+
+import pandas as pd
+
+# 表头总在前几十行内，只嗅探文件开头这一段
+HEADER_SNIFF_BYTES = 64 * 1024
+
+# xlsx 没有字节偏移，表头在前这么多行内查找
+HEADER_SNIFF_ROWS = 100
+
+# 平台偶尔导出 GBK / UTF-16 编码的账单：先看 BOM（UTF-32 的 BOM 以 UTF-16 的开头，先判断），再依次试解码
+ENCODING_BOMS = [(codecs.BOM_UTF32_LE, 'utf-32-le'), (codecs.BOM_UTF32_BE, 'utf-32-be'), (codecs.BOM_UTF8, 'utf-8'),
+                 (codecs.BOM_UTF16_LE, 'utf-16-le'), (codecs.BOM_UTF16_BE, 'utf-16-be')]
+CANDIDATE_ENCODINGS = ('utf-8', 'gb18030')
+
+# 账单文件的前几个字节：gzip 压缩的 CSV，或 xlsx（zip 容器）
+GZIP_MAGIC = b'\x1f\x8b'
+XLSX_MAGIC = b'PK\x03\x04'
+
+# zip 包里当作账单读取的文件
+STATEMENT_EXTENSIONS = ('.csv', '.gz', '.xlsx')
+# 网页上传框接受的文件类型
+STATEMENT_UPLOAD_TYPES = ['csv', 'gz', 'xlsx', 'zip']
+
+# 大文件模式每块行数
+DEFAULT_CHUNKSIZE = 200_000
+
+# 可选的 pyarrow 解析引擎；未安装时回退到 pandas 自带的 C 引擎，结果一致
+CSV_ENGINE = os.environ.get('RECON_CSV_ENGINE') or ('pyarrow' if importlib.util.find_spec('pyarrow') else 'c')
+
+def sniff_encoding(prefix):
+    """(codec, BOM length in bytes) of a statement, from a prefix of its bytes"""
+    for bom, codec in ENCODING_BOMS:
+        if prefix.startswith(bom):
+            return codec, len(bom)
+    # 无 BOM 的 UTF-16：ASCII 字符的另一半字节是 0
+    sample = prefix[:4096]
+    if len(sample) >= 4 and sample.count(0) >= len(sample) // 4:
+        return ('utf-16-le' if sample[1::2].count(0) > sample[0::2].count(0) else 'utf-16-be'), 0
+    for codec in CANDIDATE_ENCODINGS:
+        try:
+            # 增量解码：前缀末尾被截断的多字节字符不算错
+            codecs.getincrementaldecoder(codec)().decode(prefix)
+        except UnicodeDecodeError:
+            continue
+        return codec, 0
+    return 'latin-1', 0
+
+def sniff_header(uploaded_file, target_columns, max_bytes=HEADER_SNIFF_BYTES):
+    """Locate the header in a bounded prefix: (row index, byte offset, raw header fields, encoding) or None"""
+    uploaded_file.seek(0)
+    try:
+        prefix = uploaded_file.read(max_bytes)
+        uploaded_file.seek(0)
+        encoding, bom = sniff_encoding(prefix)
+        text = codecs.getincrementaldecoder(encoding)(errors='replace').decode(prefix[bom:])
+        lines = io.StringIO(text, newline='').readlines()
+        if len(prefix) == max_bytes and lines:
+            lines = lines[:-1]  # 最后一行可能被截断
+        reader = csv.reader(line.rstrip('\r\n') for line in lines)
+        for i, row in enumerate(reader):
+            clean_row = [str(x).strip() for x in row]
+            matches = sum(1 for col in target_columns if col in clean_row)
+            if matches >= 2:
+                header_line = reader.line_num - 1
+                # 偏移按原编码计（UTF-16 每个字符两个字节），跳过 BOM
+                offset = bom + len(''.join(lines[:header_line]).encode(encoding))
+                return i, offset, row, encoding
+    except Exception:
+        return None
+    return None
+
+def find_header_row(uploaded_file, target_columns, max_bytes=HEADER_SNIFF_BYTES):
+    """Find the row containing column headers, reading only a bounded prefix of the file"""
+    header = sniff_header(uploaded_file, target_columns, max_bytes)
+    return None if header is None else header[0]
+
+def select_columns(header, columns=None, fuzzy_columns=()):
+    """Positions of the header fields a processor uses (exact names, or containing a fuzzy substring)"""
+    if columns is None:
+        return None
+    wanted = set(columns)
+    return [i for i, name in enumerate(header)
+            if name.strip() in wanted or any(sub in name.strip() for sub in fuzzy_columns)]
+
+def statement_format(uploaded_file):
+    """'gzip', 'xlsx' or 'csv', from the first bytes of the file"""
+    uploaded_file.seek(0)
+    magic = uploaded_file.read(4)
+    uploaded_file.seek(0)
+    if magic.startswith(GZIP_MAGIC):
+        return 'gzip'
+    return 'xlsx' if magic == XLSX_MAGIC else 'csv'
+
+def read_statement(uploaded_file, target_columns, chunksize=None, columns=None, fuzzy_columns=(),
+                   text_columns=(), engine=None):
+    """Read a platform statement below its header - whole DataFrame, or a chunk iterator if chunksize is set
+
+    columns / fuzzy_columns project the read down to the fields the processor
+    uses; text_columns (store names, dates, addresses) are read as strings
+    instead of being type-inferred. gzip-compressed CSVs are decompressed as
+    they are parsed and .xlsx workbooks are streamed row by row; the CSV text
+    encoding (UTF-8, GBK/GB18030, UTF-16...) is sniffed from the file prefix.
+    """
+    kind = statement_format(uploaded_file)
+    if kind == 'xlsx':
+        return read_xlsx_statement(uploaded_file, target_columns, chunksize, columns, fuzzy_columns, text_columns)
+    if kind == 'gzip':
+        # GzipFile 边读边解压：表头嗅探后回到偏移处会重新解压开头一小段，不会把整个文件解压到内存
+        uploaded_file = gzip.GzipFile(fileobj=uploaded_file, mode='rb')
+
+    header = sniff_header(uploaded_file, target_columns)
+    if header is None:
+        return None
+    _, offset, fields, encoding = header
+    usecols = select_columns(fields, columns, fuzzy_columns)
+    picked = fields if usecols is None else [fields[i] for i in usecols]
+    dtype = {name: str for name in picked if name.strip() in text_columns} or None
+
+    engine = engine or CSV_ENGINE
+    # pyarrow 不支持分块读取，也无法按重名列投影；这些情况用 C 引擎
+    if engine == 'pyarrow' and not chunksize and len(set(picked)) == len(picked):
+        uploaded_file.seek(offset)
+        try:
+            df = pd.read_csv(uploaded_file, engine='pyarrow', dtype=dtype, encoding=encoding,
+                             usecols=None if usecols is None else picked)
+            if list(df.columns) == picked:
+                return df
+        except Exception:
+            pass
+
+    uploaded_file.seek(offset)
+    return pd.read_csv(uploaded_file, usecols=usecols, dtype=dtype, chunksize=chunksize, encoding=encoding)
+
+def _text_cell(value):
+    # 与 CSV 按文本读取一致：订单号等整数不带 .0；日期保留为日期（去掉时间），交给账期过滤解析
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, dt.datetime):
+        return dt.datetime(value.year, value.month, value.day)
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return value if isinstance(value, dt.date) else str(value)
+
+class XlsxChunks:
+    """Chunk iterator over worksheet rows - a context manager like pandas' chunked CSV reader"""
+
+    def __init__(self, workbook, frames):
+        self._workbook = workbook
+        self._frames = frames
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._frames)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._workbook.close()
+
+def _xlsx_frames(rows, fields, chunksize, columns, fuzzy_columns, text_columns):
+    usecols = select_columns(fields, columns, fuzzy_columns)
+    positions = list(range(len(fields))) if usecols is None else usecols
+    picked = [fields[i] for i in positions]
+    text = [name in text_columns for name in picked]
+    batch = []
+    for row in rows:
+        values = [row[i] if i < len(row) else None for i in positions]
+        if all(v is None for v in values):
+            continue  # 与 CSV 一样跳过空行
+        batch.append([_text_cell(v) if is_text else v for v, is_text in zip(values, text)])
+        if chunksize and len(batch) == chunksize:
+            yield pd.DataFrame(batch, columns=picked)
+            batch = []
+    if batch or not chunksize:
+        yield pd.DataFrame(batch, columns=picked)
+
+def _open_workbook(uploaded_file):
+    from openpyxl import load_workbook
+
+    uploaded_file.seek(0)
+    return load_workbook(uploaded_file, read_only=True, data_only=True)
+
+def _xlsx_header(workbook, target_columns):
+    """(remaining row iterator, header fields, rows above the header) on the first sheet with the header, or None"""
+    for sheet in workbook.worksheets:
+        rows, above = sheet.iter_rows(values_only=True), []
+        for _, row in zip(range(HEADER_SNIFF_ROWS), rows):
+            fields = ['' if v is None else str(v).strip() for v in row]
+            if sum(1 for col in target_columns if col in fields) >= 2:
+                return rows, fields, above
+            above.append(fields)
+    return None
+
+def read_xlsx_statement(uploaded_file, target_columns, chunksize=None, columns=None, fuzzy_columns=(),
+                        text_columns=()):
+    """read_statement for .xlsx - openpyxl read-only mode streams the rows instead of loading the workbook
+
+    The first worksheet with the header in its first HEADER_SNIFF_ROWS rows is read.
+    """
+    workbook = _open_workbook(uploaded_file)
+    header = _xlsx_header(workbook, target_columns)
+    if header is None:
+        workbook.close()
+        return None
+    rows, fields, _ = header
+    frames = _xlsx_frames(rows, fields, chunksize, columns, fuzzy_columns, text_columns)
+    if chunksize:
+        return XlsxChunks(workbook, frames)
+    df = next(frames)
+    workbook.close()
+    return df
+
+def identify_statement(uploaded_file, targets):
+    """(name, preamble lines) for the first of targets ({name: header columns}) whose header the statement has
+
+    The preamble is the text above the header (report title, statement
+    period...). Returns None when no header matches.
+    """
+    kind = statement_format(uploaded_file)
+    if kind == 'xlsx':
+        workbook = _open_workbook(uploaded_file)
+        try:
+            for name, target_columns in targets.items():
+                header = _xlsx_header(workbook, target_columns)
+                if header is not None:
+                    return name, [' '.join(f for f in fields if f) for fields in header[2]]
+        finally:
+            workbook.close()
+        return None
+    stream = gzip.GzipFile(fileobj=uploaded_file, mode='rb') if kind == 'gzip' else uploaded_file
+    for name, target_columns in targets.items():
+        header = sniff_header(stream, target_columns)
+        if header is not None:
+            _, offset, _, encoding = header
+            stream.seek(0)
+            text = stream.read(offset).decode(encoding, errors='replace').lstrip('\ufeff')
+            stream.seek(0)
+            return name, text.splitlines()
+    return None
+
+class ZipMember:
+    """One statement inside a zip archive (path or bytes), decompressed as a stream when opened"""
+
+    def __init__(self, archive, member, size=0):
+        self.archive = archive
+        self.member = member
+        self.size = size
+
+    @contextlib.contextmanager
+    def open(self):
+        archive = io.BytesIO(self.archive) if isinstance(self.archive, (bytes, bytearray)) else self.archive
+        with zipfile.ZipFile(archive) as zf, zf.open(self.member) as f:
+            yield f
+
+class _MappedReader(io.RawIOBase):
+    """Binary file interface over an mmap (mmap itself lacks seekable() before Python 3.13, which zipfile needs)"""
+
+    def __init__(self, mapped):
+        super().__init__()
+        self._mapped = mapped
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def read(self, size=-1):
+        return self._mapped.read(None if size is None or size < 0 else size)
+
+    def readinto(self, buffer):
+        data = self._mapped.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        self._mapped.seek(offset, whence)
+        return self._mapped.tell()
+
+    def tell(self):
+        return self._mapped.tell()
+
+class MappedFile:
+    """A statement on local disk, read through a read-only memory map instead of being copied into memory"""
+
+    def __init__(self, path):
+        self.path = os.fspath(path)
+
+    @contextlib.contextmanager
+    def open(self):
+        with open(self.path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield f  # 空文件无法映射
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield _MappedReader(mapped)
+
+def source_size(source):
+    """Size in bytes of a statement source as uploaded (compressed size for zip members)"""
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    if isinstance(source, ZipMember):
+        return source.size
+    if isinstance(source, MappedFile):
+        return os.path.getsize(source.path)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return len(source)
+    size = getattr(source, 'size', None)
+    if size is None:
+        size = source.seek(0, os.SEEK_END)
+        source.seek(0)
+    return size
+
+@contextlib.contextmanager
+def open_source(source):
+    """Open a statement given as a path, raw bytes, a zip member, a mapped file or an already-open binary file"""
+    if isinstance(source, (ZipMember, MappedFile)):
+        with source.open() as f:
+            yield f
+    elif isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            yield f
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        yield io.BytesIO(source)
+    else:
+        source.seek(0)
+        yield source
+
+def _statement_member(info):
+    # zip 包里只取账单（CSV / gzip / xlsx），跳过目录、macOS 资源文件和隐藏文件
+    base = os.path.basename(info.filename)
+    return (not info.is_dir() and not info.filename.startswith('__MACOSX/')
+            and not base.startswith('.') and base.lower().endswith(STATEMENT_EXTENSIONS))
+
+def expand_uploads(files):
+    """Statement files as ([(name, source)], [(name, error)]) - each zip contributes one entry per statement inside
+
+    files are paths or uploaded (binary, named) files. Zip members become
+    ZipMember sources that are decompressed only when processed; an uploaded
+    zip is kept as its compressed bytes. A zip that cannot be opened is
+    reported in the error list instead of failing the whole batch.
+    """
+    entries, errors = [], []
+    for f in files or []:
+        name = os.fspath(f) if isinstance(f, (str, os.PathLike)) else getattr(f, 'name', 'upload')
+        if not name.lower().endswith('.zip'):
+            entries.append((name, f))
+            continue
+        try:
+            if isinstance(f, (str, os.PathLike)):
+                archive = f
+            else:
+                # 各成员可能在不同线程里同时解压，共用一个文件对象会互相 seek；只复制压缩后的字节
+                f.seek(0)
+                archive = f.read()
+            with zipfile.ZipFile(io.BytesIO(archive) if isinstance(archive, bytes) else archive) as zf:
+                members = [(f"{name}/{info.filename}", ZipMember(archive, info.filename, info.compress_size))
+                           for info in zf.infolist() if _statement_member(info)]
+        except (zipfile.BadZipFile, OSError) as e:
+            errors.append((name, e))
+            continue
+        if not members:
+            errors.append((name, ValueError("zip 中没有账单文件（CSV / gz / xlsx）")))
+        entries.extend(members)
+    return entries, errors
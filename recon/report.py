@@ -0,0 +1,188 @@
+"""Report building - per-platform summaries, cross-platform totals and the Excel / zip exports"""
+import io
+import zipfile
+
+import pandas as pd
+
+from .aggregate import METRICS, aggregate, store_totals, vendor_totals
+from .fingerprint import FINGERPRINT_COLUMNS
+from .numeric import to_dollars
+from .platforms import PLATFORM_SPECS
+
+REPORT_FILE_NAME = "Luckin_Fee_Breakdown_Report_v4.xlsx"
+DETAIL_ARCHIVE_NAME = "Luckin_Fee_Breakdown_Detail_v4.zip"
+
+# Excel 单表上限 1,048,576 行（含表头），超出的明细自动拆到续表
+EXCEL_MAX_ROWS = 1_048_576
+
+# 逐块写入明细，每块转换成 Python 值的行数
+EXPORT_CHUNK_ROWS = 50_000
+PLATFORMS = list(PLATFORM_SPECS)
+
+def platform_summary(platform, row):
+    """Summary card values for one platform (label -> value) from its vendor_totals row"""
+    summary_data = {
+        '订单数': int(row['Orders']),
+        '销售额 (Gross)': float(row['Gross_Sales']),
+        '税费收入': float(row['Tax_Collected']),
+    }
+    # 其余卡片按平台声明（platforms.py 的 cards）
+    summary_data.update({label: float(row[metric]) for label, metric in PLATFORM_SPECS[platform].cards.items()})
+    return summary_data
+
+def fee_totals(cube):
+    """Cross-platform totals for the summary table, rate analysis and Excel report"""
+    # 先按原单位（整数分时精确）求和，再换算成美元
+    sums = to_dollars(cube[METRICS].sum())
+    return {
+        'orders': int(cube['Orders'].sum()),
+        'gross': float(sums['Gross_Sales']),
+        'net': float(sums['Net_Payout']),
+        'discount': float(sums['Discount']),
+        'commission': float(sums['Commission']),
+        'marketing': float(sums['Marketing']),
+        'processing': float(sums['Processing']),
+        'credit': float(sums['Credit']),
+    }
+
+# 费用汇总表：行标题 -> 统一口径指标
+SUMMARY_LINES = [
+    ('订单数', 'Orders'),
+    ('销售总额', 'Gross_Sales'),
+    ('折扣/促销 (支出)', 'Discount'),
+    ('平台佣金 (支出)', 'Commission'),
+    ('营销费 (支出)', 'Marketing'),
+    ('处理费 (支出)', 'Processing'),
+    ('平台补贴 (收入)', 'Credit'),
+    ('净入账', 'Net_Payout'),
+]
+
+def summary_rows(cube):
+    """Rows of the 费用汇总 sheet - header row first, then one row per line item"""
+    totals = vendor_totals(cube, PLATFORMS)
+    totals.loc['合计'] = totals.sum()
+    by_vendor = to_dollars(totals)
+    rows = [['项目'] + PLATFORMS + ['合计']]
+    for label, metric in SUMMARY_LINES:
+        cast = int if metric == 'Orders' else float
+        rows.append([label] + [cast(v) for v in by_vendor[metric]])
+    return rows
+
+# 门店费用表列
+STORE_REPORT_COLUMNS = {
+    'Vendor': '平台', 'Store_Standard': '门店', 'Orders': '订单数', 'Gross_Sales': '销售总额',
+    'Discount': '折扣/促销', 'Commission': '平台佣金', 'Marketing': '营销费', 'Processing': '处理费',
+    'Credit': '平台补贴', 'Fees_Net': '费用净额', 'Net_Payout': '净入账', 'Fee_Rate': '费用率',
+}
+
+def store_rows(cube):
+    """Per-store fee report (one row per vendor x store) with Chinese headers"""
+    stores = store_totals(cube)
+    stores['Fees_Net'] = (stores['Discount'] + stores['Commission'] + stores['Marketing']
+                          + stores['Processing'] - stores['Credit'])
+    stores = to_dollars(stores)
+    stores['Fee_Rate'] = stores['Fees_Net'] / stores['Gross_Sales'].where(stores['Gross_Sales'] != 0)
+    return stores[list(STORE_REPORT_COLUMNS)].rename(columns=STORE_REPORT_COLUMNS)
+
+def _cell_columns(df):
+    """Column values ready for xlsxwriter: NaN/NaT -> None (left blank); Timestamps are datetimes"""
+    return [col.astype(object).where(col.notna(), None).tolist() for _, col in df.items()]
+
+def _write_rows(ws, df, first_row=0, header_format=None, max_rows=None):
+    """Stream a frame into a worksheet row by row (header first); returns rows written"""
+    ws.write_row(first_row, 0, [str(c) for c in df.columns], header_format)
+    total = len(df) if max_rows is None else min(len(df), max_rows)
+    for start in range(0, total, EXPORT_CHUNK_ROWS):
+        chunk = df.iloc[start:min(start + EXPORT_CHUNK_ROWS, total)]
+        for offset, row in enumerate(zip(*_cell_columns(chunk)), start=first_row + 1 + start):
+            ws.write_row(offset, 0, row)
+    return total
+
+def detail_sheet_names(platform, rows):
+    """Sheet names for a platform's detail rows - continuation sheets past the Excel row limit"""
+    per_sheet = EXCEL_MAX_ROWS - 1
+    count = max(1, -(-rows // per_sheet))
+    return [f'{platform}明细'] + [f'{platform}明细 ({i})' for i in range(2, count + 1)]
+
+def write_excel_report(results, output, cube=None):
+    """Write the 费用汇总 / 门店费用 sheets and per-platform detail sheets to a path or binary buffer
+
+    Rows are streamed through xlsxwriter's constant_memory mode, so memory
+    stays flat however long the detail sheets are; detail sheets longer than
+    the Excel row limit continue on "<platform>明细 (2)", "(3)", ...
+    """
+    import xlsxwriter
+
+    cube = aggregate(results) if cube is None else cube
+    wb = xlsxwriter.Workbook(output, {'constant_memory': True, 'default_date_format': 'yyyy-mm-dd'})
+    try:
+        # 格式定义
+        fmt_header = wb.add_format({
+            'bold': True, 'bg_color': '#0022AB', 'font_color': 'white',
+            'border': 1, 'align': 'center', 'valign': 'vcenter'
+        })
+        fmt_currency = wb.add_format({'num_format': '$#,##0.00'})
+        fmt_percent = wb.add_format({'num_format': '0.0%'})
+
+        # Sheet 1: 费用汇总（表头行 + 空行 + 明细行，与旧版布局一致）
+        rows = summary_rows(cube)
+        ws1 = wb.add_worksheet('费用汇总')
+        ws1.set_column('A:A', 20)
+        ws1.set_column(1, len(PLATFORMS) + 1, 15, fmt_currency)  # 各平台 + 合计
+        ws1.write_row(0, 0, rows[0], fmt_header)
+        ws1.write_row(1, 0, rows[0])
+        for r, row in enumerate(rows[1:], start=2):
+            ws1.write_row(r, 0, row)
+
+        # Sheet 2: 门店费用
+        ws2 = wb.add_worksheet('门店费用')
+        ws2.set_column('A:A', 12)
+        ws2.set_column('B:B', 30)
+        ws2.set_column('D:K', 14, fmt_currency)
+        ws2.set_column('L:L', 10, fmt_percent)
+        _write_rows(ws2, store_rows(cube), header_format=fmt_header)
+
+        # Sheet 3: 各平台明细（超出单表行数上限时拆成续表）
+        for platform, df in results.items():
+            if df is None:
+                continue
+            df = to_dollars(df.drop(columns=FINGERPRINT_COLUMNS, errors='ignore'))
+            per_sheet = EXCEL_MAX_ROWS - 1
+            for i, name in enumerate(detail_sheet_names(platform, len(df))):
+                ws = wb.add_worksheet(name)
+                _write_rows(ws, df.iloc[i * per_sheet:], max_rows=per_sheet)
+    finally:
+        wb.close()
+    return output
+
+def build_excel_report(results, cube=None):
+    """Excel report as an in-memory buffer, ready for download"""
+    output = io.BytesIO()
+    write_excel_report(results, output, cube)
+    output.seek(0)
+    return output
+
+def write_detail_archive(results, output, cube=None, fmt='csv'):
+    """Zip of the summary, per-store fees and per-platform detail as CSV or Parquet - much faster than Excel"""
+    cube = aggregate(results) if cube is None else cube
+    rows = summary_rows(cube)
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zf:
+        tables = [('费用汇总', pd.DataFrame(rows[1:], columns=rows[0])), ('门店费用', store_rows(cube))]
+        tables += [(f'{platform}明细', to_dollars(df.drop(columns=FINGERPRINT_COLUMNS, errors='ignore')))
+                   for platform, df in results.items() if df is not None]
+        for name, df in tables:
+            if fmt == 'parquet':
+                # Parquet 自带压缩，不再 deflate
+                zf.writestr(f'{name}.parquet', df.to_parquet(index=False), compress_type=zipfile.ZIP_STORED)
+            else:
+                with zf.open(f'{name}.csv', 'w') as raw, \
+                        io.TextIOWrapper(raw, encoding='utf-8-sig', newline='') as text:
+                    df.to_csv(text, index=False, chunksize=EXPORT_CHUNK_ROWS)
+    return output
+
+def build_detail_archive(results, cube=None, fmt='csv'):
+    """CSV/Parquet zip as an in-memory buffer, ready for download"""
+    output = io.BytesIO()
+    write_detail_archive(results, output, cube, fmt)
+    output.seek(0)
+    return output
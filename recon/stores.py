@@ -0,0 +1,113 @@
+"""Store identification - mapping tables and the keyword matcher"""
+import csv
+import functools
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+# 门店映射表（data/stores.csv 与 data/store_keywords.csv）
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+STORE_TABLE_PATH = os.path.join(DATA_DIR, 'stores.csv')
+STORE_KEYWORDS_PATH = os.path.join(DATA_DIR, 'store_keywords.csv')
+
+def load_store_table(stores_path=STORE_TABLE_PATH, keywords_path=STORE_KEYWORDS_PATH):
+    """Load store ID labels and keyword rules from the mapping tables"""
+    with open(stores_path, newline='', encoding='utf-8') as f:
+        store_map = {row['store_id'].strip().upper(): row['store_label'].strip()
+                     for row in csv.DictReader(f)}
+    # 关键词按文件顺序排优先级；platform 为空表示所有平台通用
+    with open(keywords_path, newline='', encoding='utf-8') as f:
+        keywords = [(row['keyword'].strip().lower(), row['store_id'].strip().upper(),
+                     (row.get('platform') or '').strip().lower())
+                    for row in csv.DictReader(f) if row['keyword'].strip()]
+    return store_map, keywords
+
+# 官方门店ID映射
+STORE_ID_MAP, STORE_KEYWORDS = load_store_table()
+
+# Uber location name mapping
+UBER_LOCATION_MAP = {kw: sid for kw, sid, plat in STORE_KEYWORDS if plat == 'uber'}
+
+STORE_ID_PATTERN = re.compile(r'US\d{5}', re.IGNORECASE)
+
+class KeywordMatcher:
+    """Aho-Corasick matcher - returns the value of the highest-priority keyword found in text"""
+
+    def __init__(self, keywords):
+        # keywords: [(keyword, value), ...]，越靠前优先级越高
+        self.values = [value for _, value in keywords]
+        goto, fail, best = [{}], [0], [None]
+        for priority, (keyword, _) in enumerate(keywords):
+            state = 0
+            for ch in keyword:
+                if ch not in goto[state]:
+                    goto.append({})
+                    fail.append(0)
+                    best.append(None)
+                    goto[state][ch] = len(goto) - 1
+                state = goto[state][ch]
+            if best[state] is None or priority < best[state]:
+                best[state] = priority
+
+        # BFS 建立失败指针，并把后缀状态上的命中合并进来
+        queue = list(goto[0].values())
+        for state in queue:
+            for ch, nxt in goto[state].items():
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                inherited = best[fail[nxt]]
+                if inherited is not None and (best[nxt] is None or inherited < best[nxt]):
+                    best[nxt] = inherited
+                queue.append(nxt)
+        self._goto, self._fail, self._best = goto, fail, best
+
+    def search(self, text):
+        goto, fail, best = self._goto, self._fail, self._best
+        state, found = 0, None
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            hit = best[state]
+            if hit is not None and (found is None or hit < found):
+                found = hit
+                if found == 0:
+                    break
+        return None if found is None else self.values[found]
+
+@functools.lru_cache(maxsize=None)
+def get_store_matcher(platform='generic'):
+    """Build (once per platform) the keyword matcher: platform rules first, then shared address rules"""
+    specific = [(kw, sid) for kw, sid, plat in STORE_KEYWORDS if plat and plat == platform]
+    shared = [(kw, sid) for kw, sid, plat in STORE_KEYWORDS if not plat]
+    return KeywordMatcher(specific + shared)
+
+def extract_store_id(raw_text, platform='generic'):
+    """Extract standardized store ID from various platform formats"""
+    if pd.isna(raw_text):
+        return '未知门店'
+    
+    text = str(raw_text).strip()
+    
+    # Check for direct US000XX pattern
+    for match in STORE_ID_PATTERN.finditer(text):
+        store_id = match.group().upper()
+        if store_id in STORE_ID_MAP:
+            return STORE_ID_MAP[store_id]
+    
+    # Platform-specific keywords, then address-based mapping
+    store_id = get_store_matcher(platform).search(text.lower())
+    if store_id is not None:
+        return STORE_ID_MAP.get(store_id, store_id)
+    
+    return text[:30] if len(text) > 30 else text
+
+def map_store_ids(raw, platform='generic'):
+    """Vectorized extract_store_id - resolve each distinct raw value once and broadcast back"""
+    codes, uniques = pd.factorize(raw)
+    labels = np.array([extract_store_id(u, platform) for u in uniques] + ['未知门店'], dtype=object)
+    return pd.Series(labels[codes], index=raw.index)
@@ -0,0 +1,97 @@
+"""Reconciliation exceptions - expected vs. reported net per order, flagged only past a tolerance"""
+import numpy as np
+import pandas as pd
+
+from .numeric import CENTS_PER_DOLLAR, is_cents, to_dollars
+from .platforms import PLATFORM_SPECS
+
+# 各平台预期净入账 = Σ 明细列 × 符号（费用列已是正数，记 -1），见 platforms.py
+EXPECTED_NET = {name: spec.expected_net for name, spec in PLATFORM_SPECS.items()}
+
+EXCEPTIONS_FILE_NAME = "Luckin_Reconciliation_Exceptions.csv"
+
+# 默认容差（美元）：超过 1 美分才算差异
+DEFAULT_TOLERANCE = 0.01
+
+# 差异原因（按优先级判断）
+REASONS = {
+    'missing_payout': '平台未入账',
+    'adjustment': '无销售额的调整',
+    'over_paid': '入账高于预期',
+    'under_paid': '入账低于预期',
+}
+
+EXCEPTION_COLUMNS = ['Vendor', 'Store_Standard', 'Date', 'Row_Key', 'Expected_Net', 'Net_Payout',
+                     'Variance', 'Reason']
+
+def expected_net(platform, df):
+    """Expected net payout per order, vectorized over the whole frame (same unit as the frame's amounts)"""
+    signs = EXPECTED_NET[platform]
+    cols = [c for c in signs if c in df.columns]
+    values = df[cols].fillna(0).to_numpy()
+    return values @ np.array([signs[c] for c in cols], dtype=values.dtype)
+
+def _platform_exceptions(platform, df, tolerance):
+    expected = expected_net(platform, df)
+    payout = df['Net_Payout'].fillna(0).to_numpy()
+    # 整数分的明细按分比较，避免浮点边界误判
+    limit = round(tolerance * CENTS_PER_DOLLAR) if is_cents(df['Net_Payout']) else tolerance + 1e-9
+    variance = payout - expected
+    flagged = np.flatnonzero(np.abs(variance) > limit)
+    if len(flagged) == 0:
+        return None
+
+    rows, expected, payout, variance = df.iloc[flagged], expected[flagged], payout[flagged], variance[flagged]
+    gross = rows['Gross_Sales'].fillna(0).to_numpy()
+    reason = np.select([(payout == 0) & (expected != 0), gross == 0, variance > 0],
+                       ['missing_payout', 'adjustment', 'over_paid'], default='under_paid')
+    out = pd.DataFrame({
+        'Vendor': platform,
+        'Store_Standard': rows['Store_Standard'].to_numpy(),
+        'Date': rows['Date'].to_numpy() if 'Date' in rows.columns else pd.NaT,
+        'Row_Key': rows['Row_Key'].to_numpy() if 'Row_Key' in rows.columns else None,
+        'Expected_Net': expected,
+        'Net_Payout': payout,
+        'Variance': variance,
+        'Reason': reason,
+    })
+    if is_cents(df['Net_Payout']):
+        return to_dollars(out)
+    # 浮点明细的差额去掉求和误差，按分显示
+    return out.round({'Expected_Net': 2, 'Net_Payout': 2, 'Variance': 2})
+
+def find_exceptions(results, tolerance=DEFAULT_TOLERANCE):
+    """Orders whose reported net differs from the expected net by more than tolerance dollars, largest first
+
+    Only detail frames are checked (chunked rollups have no order rows).
+    Amounts come back in dollars whatever the input unit.
+    """
+    parts = [_platform_exceptions(platform, df, tolerance) for platform, df in results.items()
+             if df is not None and len(df) > 0 and 'Date' in df.columns and platform in EXPECTED_NET]
+    parts = [p for p in parts if p is not None]
+    if not parts:
+        return pd.DataFrame(columns=EXCEPTION_COLUMNS)
+    exceptions = pd.concat(parts, ignore_index=True)
+    order = np.argsort(-exceptions['Variance'].abs().to_numpy(), kind='stable')
+    return exceptions.iloc[order].reset_index(drop=True)
+
+# 差异汇总表列
+EXCEPTION_SUMMARY_COLUMNS = {
+    'Vendor': '平台', 'Store_Standard': '门店', 'Reason': '原因', 'Orders': '订单数',
+    'Variance': '差异合计', 'Max_Variance': '最大单笔差异',
+}
+
+def exception_summary(exceptions):
+    """Exceptions grouped by vendor x store x reason - counts, net variance and the largest single gap"""
+    if len(exceptions) == 0:
+        return pd.DataFrame(columns=list(EXCEPTION_SUMMARY_COLUMNS.values()))
+    groups = exceptions.assign(Abs=exceptions['Variance'].abs()).groupby(
+        ['Vendor', 'Store_Standard', 'Reason'], sort=True, dropna=False, observed=True)
+    summary = groups.agg(Orders=('Variance', 'size'), Variance=('Variance', 'sum'),
+                         Max_Variance=('Abs', 'max')).reset_index()
+    summary['Reason'] = summary['Reason'].map(REASONS)
+    return summary[list(EXCEPTION_SUMMARY_COLUMNS)].rename(columns=EXCEPTION_SUMMARY_COLUMNS)
+
+def exceptions_csv(exceptions):
+    """Exception rows as UTF-8 (BOM, for Excel) CSV bytes, ready for download"""
+    return exceptions.to_csv(index=False).encode('utf-8-sig')
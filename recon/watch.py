@@ -0,0 +1,177 @@
+"""Watch-folder ingestion - statements dropped into a local directory are processed as they land
+
+FolderWatcher.poll() scans the directory (subfolders included, the output
+folder and hidden entries skipped) for statements with STATEMENT_EXTENSIONS.
+A file counts as landed once its size and mtime are unchanged between two
+polls, so a copy still in progress is not read half-written. Each new or
+changed file is identified by its header (platform) and the period line above
+the header (statement period - without one every row is kept), then processed
+from a read-only memory map instead of being copied into memory; results are
+cached on disk under <dir>/_recon/cache. refresh(months) recombines every file
+touching those months (cache hits) so their outputs can be rewritten in
+<dir>/_recon/<YYYY-MM>/. Statements are always read whole: a month combines
+several files, and only per-order rows can drop the orders they overlap on.
+"""
+import datetime as dt
+import json
+import os
+
+from .cache import ResultCache
+from .parallel import run_platforms
+from .period import Period, period_from_text
+from .platforms import PLATFORM_SPECS
+from .processors import combine_results, order_count, split_by_month, split_results_by_month
+from .readers import STATEMENT_EXTENSIONS, MappedFile, identify_statement
+
+# 输出目录（在被监控目录内，扫描时跳过）、处理状态文件
+WATCH_OUTPUT_DIR = '_recon'
+WATCH_STATE_FILE = 'watch_state.json'
+
+# 按表头识别平台
+HEADER_TARGETS = {name: list(spec.target_columns) for name, spec in PLATFORM_SPECS.items()}
+
+def classify_statement(path):
+    """(platform, Period or None) from a statement's header and preamble; platform is None if unrecognised"""
+    with MappedFile(path).open() as f:
+        found = identify_statement(f, HEADER_TARGETS)
+    if found is None:
+        return None, None
+    platform, preamble = found
+    return platform, period_from_text(preamble)
+
+def _period_state(period):
+    return None if period is None else [period.start.isoformat(), period.end.isoformat()]
+
+def _period_of(bounds):
+    return None if not bounds else Period(*(dt.date.fromisoformat(b) for b in bounds))
+
+class FolderWatcher:
+    """Incremental processing of the statements in one local directory"""
+
+    def __init__(self, directory, mode='thread', compact=False, cache_dir=None, settle=True):
+        self.directory = os.path.abspath(directory)
+        self.output_dir = os.path.join(self.directory, WATCH_OUTPUT_DIR)
+        self.mode = mode
+        self.compact = compact
+        # settle=False：一次性补录时文件已经写完，不用等两轮扫描确认
+        self.settle = settle
+        self.cache = ResultCache(disk_dir=cache_dir or os.path.join(self.output_dir, 'cache'))
+        self.state_path = os.path.join(self.output_dir, WATCH_STATE_FILE)
+        self.files = self._load_state()  # 相对路径 -> 处理记录
+        self._seen = {}
+
+    def _load_state(self):
+        if not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path, encoding='utf-8') as f:
+            state = json.load(f)
+        # 处理参数变了，旧记录作废（结果缓存按参数区分，不会误用）
+        return state['files'] if state.get('options') == self._options_state() else {}
+
+    def _save_state(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        tmp = self.state_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'options': self._options_state(), 'files': self.files}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.state_path)
+
+    def _options_state(self):
+        return {'compact': self.compact}
+
+    def scan(self):
+        """{relative path: [size, mtime_ns]} of the statements currently in the directory"""
+        found = {}
+        for root, dirs, names in os.walk(self.directory):
+            dirs[:] = sorted(d for d in dirs if not d.startswith('.') and
+                             os.path.join(root, d) != self.output_dir)
+            for name in sorted(names):
+                if name.startswith('.') or not name.lower().endswith(STATEMENT_EXTENSIONS):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    info = os.stat(path)
+                except OSError:
+                    continue  # 扫描期间被删除
+                found[os.path.relpath(path, self.directory)] = [info.st_size, info.st_mtime_ns]
+        return found
+
+    def poll(self):
+        """Process the statements that landed or changed since the last poll
+
+        Returns (processed, months): [(relative path, record)] for each file
+        handled this poll - platform None without an error means it is not a
+        platform statement (a bank export, say) and was skipped - and the
+        months whose outputs are now stale, including those of changed or
+        removed files.
+        """
+        found = self.scan()
+        landed = {rel: sig for rel, sig in found.items() if not self.settle or self._seen.get(rel) == sig}
+        self._seen = found
+
+        months = set()
+        for rel in [rel for rel in self.files if rel not in found]:
+            months.update(self.files.pop(rel)['months'])
+        fresh = {rel: sig for rel, sig in landed.items()
+                 if rel not in self.files or self.files[rel]['signature'] != sig}
+        for rel in fresh:
+            if rel in self.files:
+                months.update(self.files.pop(rel)['months'])
+
+        processed, tasks = [], {}
+        for rel, sig in fresh.items():
+            entry = {'signature': sig, 'platform': None, 'period': None, 'months': [], 'rows': 0, 'error': None}
+            try:
+                platform, period = classify_statement(os.path.join(self.directory, rel))
+            except Exception as e:
+                platform, period, entry['error'] = None, None, f"{type(e).__name__}: {e}"
+            entry['platform'], entry['period'] = platform, _period_state(period)
+            self.files[rel] = entry
+            if platform is None:
+                processed.append((rel, entry))
+            else:
+                tasks[rel] = entry
+
+        for rel, df, error in self._process(tasks):
+            entry = tasks[rel]
+            if error is not None or df is None:
+                entry['error'] = str(error or '文件格式错误')
+            else:
+                entry['months'] = sorted(split_by_month(df)) if len(df) else []
+                entry['rows'] = order_count(df)
+                months.update(entry['months'])
+            processed.append((rel, entry))
+        if fresh or months:
+            self._save_state()
+        return processed, sorted(months)
+
+    def _process(self, entries):
+        """Yield (relative path, result, error) for {relative path: record}, one run per statement period"""
+        by_period = {}
+        for rel, entry in entries.items():
+            by_period.setdefault(tuple(entry['period'] or ()), {})[(entry['platform'], rel)] = \
+                MappedFile(os.path.join(self.directory, rel))
+        for bounds, tasks in by_period.items():
+            period = _period_of(bounds)
+            for (_, rel), df, error in run_platforms(tasks, mode=self.mode, cache=self.cache,
+                                                     period=period, compact=self.compact):
+                yield rel, df, error
+
+    def refresh(self, months):
+        """Yield (month, {platform: frame}) for each month, combined from every processed file touching it"""
+        months = set(months)
+        entries = {rel: entry for rel, entry in self.files.items()
+                   if entry['error'] is None and months.intersection(entry['months'])}
+        frames = {}
+        for rel, df, error in self._process(entries):
+            if error is None and df is not None:
+                frames[rel] = df
+        results = {}
+        for platform in PLATFORM_SPECS:
+            # 按修改时间合并：重叠的订单以后落地的文件为准
+            rels = sorted((rel for rel in frames if entries[rel]['platform'] == platform),
+                          key=lambda rel: (entries[rel]['signature'][1], rel))
+            results[platform] = combine_results([frames[rel] for rel in rels], compact=self.compact)
+        by_month = split_results_by_month(results)
+        for month in sorted(months):
+            # 某月的文件全部移除后也返回一次（空结果），让调用方清掉旧输出
+            yield month, by_month.get(month, dict.fromkeys(PLATFORM_SPECS))
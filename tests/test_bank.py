@@ -0,0 +1,33 @@
+"""Bank deposit matching: a payout split over two deposits on consecutive days matches whatever their IDs"""
+import pandas as pd
+import pytest
+
+from recon.bank import match_deposits
+
+def batches():
+    return pd.DataFrame({
+        'Batch_ID': ['UberEats-US00001-2025-10-05'],
+        'Vendor': ['UberEats'],
+        'Store_Standard': ['US00001'],
+        'Week_End': pd.to_datetime(['2025-10-05']),
+        'Expected_Date': pd.to_datetime(['2025-10-08']),
+        'Amount': [10000],  # 整数分
+    })
+
+def deposits(first_id, second_id):
+    return pd.DataFrame({
+        'Deposit_ID': [first_id, second_id],
+        'Date': pd.to_datetime(['2025-10-08', '2025-10-09']),
+        'Amount': [6000, 4000],
+        'Vendor': ['UberEats', 'UberEats'],
+        'Description': ['UBER EATS PAYOUT', 'UBER EATS PAYOUT'],
+    })
+
+@pytest.mark.parametrize('first_id, second_id', [('T1', 'T2'), ('T2', 'T1')])
+def test_split_over_next_day_matches_in_either_id_order(first_id, second_id):
+    matched = match_deposits(batches(), deposits(first_id, second_id))
+    matches = matched['matches']
+    assert list(matches['Match_Type']) == ['split']
+    assert sorted(matches['Deposit_IDs'].iloc[0].split('; ')) == ['T1', 'T2']
+    assert len(matched['unmatched_payouts']) == 0
+    assert len(matched['unmatched_deposits']) == 0
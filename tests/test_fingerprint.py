@@ -0,0 +1,87 @@
+"""Row_Key dedup: an order's several rows in one statement are all kept, overlapping statements count once"""
+import io
+
+import pytest
+
+from recon.processors import combine_results, process_doordash
+
+HEADER = 'DoorDash 订单 ID,时间戳本地日期,店铺名称,小计,税款小计,由您出资的折扣,佣金,营销费,错误费用,营销积分,由 DoorDash 出资的折扣,净总计,描述\n'
+STORE = 'Luckin Coffee (755 Broadway)'
+
+def statement(*rows):
+    return io.BytesIO((HEADER + ''.join(f"{row}\n" for row in rows)).encode('utf-8'))
+
+# 订单 A1：一行销售 + 一行错误调整
+SALE = f'A1,10/14/2025,{STORE},$20.00,$1.78,$0.00,-$5.00,$0.00,$0.00,$0.00,$0.00,$16.78,Delivery'
+ADJUSTMENT = f'A1,10/20/2025,{STORE},$0.00,$0.00,$0.00,$0.00,$0.00,-$3.00,$0.00,$0.00,-$3.00,Error charge'
+OTHER = f'B7,10/15/2025,{STORE},$10.00,$0.89,$0.00,-$2.50,$0.00,$0.00,$0.00,$0.00,$8.39,Delivery'
+
+def net(df):
+    return round(float(df['Net_Payout'].sum()), 2)
+
+def test_order_rows_in_one_statement_are_kept():
+    df = process_doordash(statement(SALE, ADJUSTMENT, OTHER))
+    assert len(df) == 3
+    assert df['Row_Key'].nunique() == 3
+    assert net(df) == 22.17
+
+def test_combine_keeps_adjustment_rows_and_drops_overlap():
+    first = process_doordash(statement(SALE, ADJUSTMENT, OTHER))
+    unrelated = process_doordash(statement(f'C3,10/16/2025,{STORE},$5.00,$0.44,$0.00,-$1.25,$0.00,$0.00,$0.00,$0.00,$4.19,Delivery'))
+    combined = combine_results([first, unrelated])
+    assert len(combined) == 4
+    assert net(combined) == 26.36
+    # 同一份账单再给一次：重叠的行只算一次
+    again = combine_results([first, process_doordash(statement(SALE, ADJUSTMENT, OTHER))])
+    assert len(again) == 3
+    assert net(again) == 22.17
+
+def test_ledger_ingests_every_row_of_an_order(tmp_path):
+    pytest.importorskip('pyarrow')
+    from recon.ledger import ingest, read_ledger
+
+    results = {'DoorDash': process_doordash(statement(SALE, ADJUSTMENT))}
+    counts = ingest(results, str(tmp_path))
+    assert counts['DoorDash']['new'] == 2
+    assert len(read_ledger(str(tmp_path))) == 2
+    # 重复导入不新增
+    assert ingest(results, str(tmp_path))['DoorDash'] == {'new': 0, 'changed': 0, 'unchanged': 2}
+
+def test_chunked_rollups_of_several_statements_are_refused():
+    # 分块汇总没有订单指纹：两份重叠的账单直接相加会把订单算两遍
+    first = process_doordash(statement(SALE, ADJUSTMENT, OTHER), chunksize=2)
+    assert int(first['Orders'].sum()) == 3
+    assert combine_results([first]) is first
+    with pytest.raises(ValueError):
+        combine_results([first, process_doordash(statement(SALE, ADJUSTMENT, OTHER), chunksize=2)])
+
+def test_sale_and_adjustment_in_different_files():
+    week1 = process_doordash(statement(SALE, OTHER))
+    week2 = process_doordash(statement(ADJUSTMENT))
+    combined = combine_results([week1, week2])
+    assert len(combined) == 3
+    assert net(combined) == 22.17
+
+def test_exports_listing_rows_in_another_order():
+    # 月报按时间倒序（调整在前），再叠加一份只有销售行的周报：销售只算一次
+    monthly = process_doordash(statement(ADJUSTMENT, SALE, OTHER))
+    weekly = process_doordash(statement(SALE))
+    for parts in ([monthly, weekly], [weekly, monthly]):
+        combined = combine_results(parts)
+        assert len(combined) == 3
+        assert net(combined) == 22.17
+    assert set(monthly['Row_Key']) == set(process_doordash(statement(SALE, ADJUSTMENT, OTHER))['Row_Key'])
+
+def test_identical_rows_of_one_order_stay_separate():
+    df = process_doordash(statement(SALE, SALE))
+    assert df['Row_Key'].nunique() == 2
+    assert len(combine_results([df, process_doordash(statement(SALE, SALE))])) == 2
+
+def test_ledger_adjustment_in_a_later_file_is_new(tmp_path):
+    pytest.importorskip('pyarrow')
+    from recon.ledger import ingest, read_ledger
+
+    ingest({'DoorDash': process_doordash(statement(SALE, OTHER))}, str(tmp_path))
+    counts = ingest({'DoorDash': process_doordash(statement(ADJUSTMENT))}, str(tmp_path))
+    assert counts['DoorDash'] == {'new': 1, 'changed': 0, 'unchanged': 0}
+    assert net(read_ledger(str(tmp_path))) == 22.17
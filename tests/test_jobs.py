@@ -0,0 +1,25 @@
+"""Finished jobs keep only their status in memory: the result is handed to its owner once, or read from disk"""
+import os
+
+from recon.jobs import JobRunner
+
+def finished(runner, result):
+    job = runner.submit(lambda job: result)
+    runner._pool.shutdown(wait=True)
+    return job
+
+def test_in_memory_result_is_handed_over_once():
+    runner = JobRunner()
+    job = finished(runner, {'rows': 3})
+    assert runner.take_result(job) == {'rows': 3}
+    assert job.result is None and runner.take_result(job) is None
+
+def test_saved_result_is_not_kept_in_memory(tmp_path):
+    state_dir = str(tmp_path / 'jobs')
+    job = finished(JobRunner(state_dir=state_dir), {'rows': 3})
+    assert job.result is None and os.path.exists(job.result_path)
+
+    runner = JobRunner(state_dir=state_dir)  # 服务重启后
+    restored = runner.get(job.id)
+    assert restored.status == 'done' and restored.result is None
+    assert runner.take_result(restored) == runner.take_result(restored) == {'rows': 3}
@@ -0,0 +1,27 @@
+"""clean_num_series gives exactly what clean_num gives, value by value, whatever the column dtype"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from recon.numeric import clean_num, clean_num_series
+
+VALUES = ['12.50', '', '   ', None, np.nan, pd.NA, '(12.50)', '$1,234.56', '($1,234.56)', '-3', '+.5', '1e3',
+          'inf', 'N/A', 'abc', '(abc)', '12.50 USD', '$', '()', 7, 2.5]
+
+def expected(values):
+    return np.array([clean_num(v) for v in values], dtype='float64')
+
+@pytest.mark.parametrize('dtype', [object, 'str'])
+def test_matches_clean_num(dtype):
+    values = VALUES if dtype is object else [v for v in VALUES if not isinstance(v, (int, float))]
+    s = pd.Series(values, dtype=dtype)  # str 列里的 None / NA 存成 NaN，对照的是列里实际的值
+    np.testing.assert_array_equal(clean_num_series(s).to_numpy(), expected(s))
+
+def test_none_counts_as_zero_and_nan_stays_missing():
+    out = clean_num_series(pd.Series([None, np.nan, '(1.25)', '$1,000'], dtype=object))
+    assert out[0] == 0.0 and np.isnan(out[1])
+    assert list(out[2:]) == [-1.25, 1000.0]
+
+def test_numeric_column_passes_through():
+    s = pd.Series([1.5, np.nan, -2.0])
+    np.testing.assert_array_equal(clean_num_series(s).to_numpy(), expected(s))